@@ -0,0 +1,55 @@
+"""add ledger tables
+
+Revision ID: 4b7e2d91c5a8
+Revises: 77b30c7e3d6e
+Create Date: 2026-10-19 10:12:41.508213
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b7e2d91c5a8'
+down_revision: Union[str, Sequence[str], None] = '77b30c7e3d6e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'ledger_entries',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('transaction_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('amount', sa.Numeric(precision=12, scale=2), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_ledger_entries_user_id_id', 'ledger_entries', ['user_id', 'id'], unique=False)
+    op.create_table(
+        'balance_snapshots',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('balance', sa.Numeric(precision=12, scale=2), nullable=False),
+        sa.Column('last_entry_id', sa.BigInteger(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_balance_snapshots_last_entry_id'), 'balance_snapshots', ['last_entry_id'], unique=False)
+    op.create_index('ix_balance_snapshots_user_id_last_entry_id', 'balance_snapshots',
+                    ['user_id', 'last_entry_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_balance_snapshots_user_id_last_entry_id', table_name='balance_snapshots')
+    op.drop_index(op.f('ix_balance_snapshots_last_entry_id'), table_name='balance_snapshots')
+    op.drop_table('balance_snapshots')
+    op.drop_index('ix_ledger_entries_user_id_id', table_name='ledger_entries')
+    op.drop_table('ledger_entries')
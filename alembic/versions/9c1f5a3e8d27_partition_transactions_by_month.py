@@ -0,0 +1,80 @@
+"""partition transactions by month
+
+Revision ID: 9c1f5a3e8d27
+Revises: 4b7e2d91c5a8
+Create Date: 2026-10-19 11:03:17.224871
+
+"""
+from datetime import datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c1f5a3e8d27'
+down_revision: Union[str, Sequence[str], None] = '4b7e2d91c5a8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# fixed so the schema does not depend on where the migration runs; PartitionManager creates
+# the further months configured by PARTITION_MONTHS_AHEAD when workers start
+MONTHS_AHEAD = 2
+
+
+def _month_start(value: datetime, offset: int = 0) -> datetime:
+    month = value.year * 12 + value.month - 1 + offset
+    return datetime(month // 12, month % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def upgrade() -> None:
+    """Upgrade schema.
+
+    Existing rows get created_at = epoch and stay in place: the old table is attached
+    as the partition covering everything before the current month. The default partition
+    catches transfers of months whose partition was never created.
+    """
+    now = datetime.now(timezone.utc)
+    op.add_column('transactions', sa.Column('created_at', sa.DateTime(timezone=True),
+                                            server_default=sa.text("'1970-01-01 00:00:00+00'"),
+                                            nullable=False))
+    op.alter_column('transactions', 'created_at', server_default=None)
+    op.drop_constraint('transactions_pkey', 'transactions', type_='primary')
+    op.create_primary_key('transactions_legacy_pkey', 'transactions', ['id', 'created_at'])
+    op.rename_table('transactions', 'transactions_legacy')
+
+    op.execute("""
+        CREATE TABLE transactions (
+            id INTEGER NOT NULL DEFAULT nextval('transactions_id_seq'),
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+            sender_id INTEGER NOT NULL REFERENCES users (id),
+            receiver_id INTEGER NOT NULL REFERENCES users (id),
+            amount NUMERIC(12, 2) NOT NULL,
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+    op.execute("ALTER SEQUENCE transactions_id_seq OWNED BY transactions.id")
+    op.create_index('ix_transactions_sender_id_created_at', 'transactions', ['sender_id', 'created_at'])
+    op.create_index('ix_transactions_receiver_id_created_at', 'transactions', ['receiver_id', 'created_at'])
+
+    op.execute(f"ALTER TABLE transactions ATTACH PARTITION transactions_legacy "
+               f"FOR VALUES FROM (MINVALUE) TO ('{_month_start(now).isoformat()}')")
+    op.execute("CREATE TABLE transactions_default PARTITION OF transactions DEFAULT")
+    for offset in range(MONTHS_AHEAD + 1):
+        start, end = _month_start(now, offset), _month_start(now, offset + 1)
+        op.execute(f"CREATE TABLE transactions_p{start:%Y_%m} PARTITION OF transactions "
+                   f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("ALTER TABLE transactions DETACH PARTITION transactions_legacy")
+    op.execute("INSERT INTO transactions_legacy (id, created_at, sender_id, receiver_id, amount) "
+               "SELECT id, created_at, sender_id, receiver_id, amount FROM transactions")
+    op.execute("ALTER SEQUENCE transactions_id_seq OWNED BY transactions_legacy.id")
+    op.execute("DROP TABLE transactions")
+    op.rename_table('transactions_legacy', 'transactions')
+    op.drop_constraint('transactions_legacy_pkey', 'transactions', type_='primary')
+    op.create_primary_key('transactions_pkey', 'transactions', ['id'])
+    op.drop_column('transactions', 'created_at')
@@ -0,0 +1,43 @@
+"""add reconciliation tables
+
+Revision ID: b2d9f7a1c4e6
+Revises: e5a8d4c0b6f3
+Create Date: 2026-10-19 15:22:48.630571
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b2d9f7a1c4e6'
+down_revision: Union[str, Sequence[str], None] = 'e5a8d4c0b6f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'reconciliation_state',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('watermark', sa.BigInteger(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_table(
+        'reconciliation_balances',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('opening_balance', sa.Numeric(precision=20, scale=2), nullable=False),
+        sa.Column('net_flow', sa.Numeric(precision=20, scale=2), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('user_id'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('reconciliation_balances')
+    op.drop_table('reconciliation_state')
@@ -0,0 +1,28 @@
+"""add version to users
+
+Revision ID: e5a8d4c0b6f3
+Revises: 9c1f5a3e8d27
+Create Date: 2026-10-19 13:41:02.917354
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a8d4c0b6f3'
+down_revision: Union[str, Sequence[str], None] = '9c1f5a3e8d27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'version')
@@ -8,10 +8,10 @@ from app.services.rabbitmq import RabbitMQClient
 
 class Dependencies:
     def __init__(self):
-        session_manager = AsyncSessionManager()
-        session = session_manager.get_session()
-        self._crud_users = CRUDUsers(session)
-        self._crud_transactions = CRUDTransactions(session)
+        self.session_manager = AsyncSessionManager()
+        session = self.session_manager.get_session()
+        self._crud_users = CRUDUsers(session, self.session_manager)
+        self._crud_transactions = CRUDTransactions(session, self.session_manager)
 
 
     @staticmethod
@@ -37,4 +37,11 @@ class Dependencies:
         return self._crud_transactions
 
     async def get_rabbitmq(self, request: Request) -> RabbitMQClient:
-        return request.app.state.rabbitmq
\ No newline at end of file
+        return request.app.state.rabbitmq
+
+    @staticmethod
+    async def check_admission(request: Request):
+        """Dependency to reject new transfers with 429 while the workers are too far behind."""
+        admission = getattr(request.app.state, "admission", None)
+        if admission is not None:
+            await admission.admit(request)
\ No newline at end of file
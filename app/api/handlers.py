@@ -1,19 +1,31 @@
 from typing_extensions import Annotated
+import asyncio
+import time
+
 import orjson
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import JSONResponse
 from loguru import logger
 
 from app.api.dependencies import Dependencies
 from app.database.crud import CRUDUsers
 from app.schemas.transaction import TransactionCreate
-from app.schemas.user import UserData
+from app.schemas.user import BulkRegistrationReport, UserData
+from app.services.bulk_import import iter_lines, iter_users, register_users
 from app.services.rabbitmq import rabbitmq
+from app.services.tracing import tracer
 
 
 main_router = APIRouter()
 dependencies = Dependencies()
 
+BULK_CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+}
+
 
 @main_router.get("/users", 
                  tags=["Users"], 
@@ -48,6 +60,40 @@ async def register_user_handler(user: Annotated[UserData, 'Login and password fo
         )
 
 
+@main_router.post("/registration/bulk",
+                  tags=["Users"],
+                  dependencies=[Depends(dependencies.verify_token)])
+async def bulk_register_users_handler(request: Request,
+                                      fmt: Annotated[str | None, Query(alias="format")] = None
+                                      ) -> BulkRegistrationReport:
+    """Registers users streamed as CSV (username,password header) or NDJSON, reports per-row conflicts.
+
+    An import can run for minutes, so it gets its own session instead of the shared one.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    fmt = fmt or BULK_CONTENT_TYPES.get(content_type)
+    if fmt is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Expected one of {sorted(BULK_CONTENT_TYPES)} or the format query parameter"
+        )
+    report = BulkRegistrationReport()
+    session = dependencies.session_manager.get_session()
+    try:
+        users = iter_users(iter_lines(request.stream()), fmt, report)
+        return await register_users(CRUDUsers(session), users, report)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error bulk registration: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed bulk registration after {report.created} users."
+        )
+    finally:
+        await session.close()
+
+
 @main_router.post("/login",
                   tags=['Users'],
                   dependencies=[Depends(dependencies.verify_token)])
@@ -67,24 +113,36 @@ async def login_user_handler(user: Annotated[UserData, "Login and password for i
 
 @main_router.post("/new-transaction", 
                   tags=["Transactions"],
-                  dependencies=[Depends(dependencies.verify_token)])
-async def create_transaction_handler(transaction: Annotated[TransactionCreate, 'Transaction data']):
-    """Creates a new transaction."""
-    if transaction.sender_id == transaction.receiver_id:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="You can't send money to yourself"
-        )
-    try:
-        task = {
-            "task": "create_transaction",
-            "data": transaction.model_dump()
-        }
-        await rabbitmq.send_message(orjson.dumps(task).decode("utf-8"))
-        return {"message": "Transaction queued."}
-    except Exception as e:
-        logger.error(f"Error queuing transaction: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to queue transaction."
-        )
\ No newline at end of file
+                  dependencies=[Depends(dependencies.verify_token), Depends(dependencies.check_admission)])
+async def create_transaction_handler(transaction: Annotated[TransactionCreate, 'Transaction data'],
+                                     wait: Annotated[bool, Query(description="Wait for the worker's result")] = False):
+    """Creates a new transaction, with wait=true responds with the settled result or 202 on timeout."""
+    with tracer.span("api.create_transaction", wait=wait):
+        if transaction.sender_id == transaction.receiver_id:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="You can't send money to yourself"
+            )
+        try:
+            task = {
+                "task": "create_transaction",
+                "data": transaction.model_dump()
+            }
+            if not wait:
+                await rabbitmq.send_message(orjson.dumps(task).decode("utf-8"))
+                return {"message": "Transaction queued."}
+            started = time.perf_counter()
+            try:
+                result = await rabbitmq.call(orjson.dumps(task).decode("utf-8"))
+            except asyncio.TimeoutError:
+                return JSONResponse(status_code=status.HTTP_202_ACCEPTED,
+                                    content={"message": "Transaction queued, result not ready yet."})
+            latency_ms = round((time.perf_counter() - started) * 1000, 2)
+            logger.debug("Transaction settled in {} ms: {}", latency_ms, result)
+            return {"message": "Transaction processed.", "result": result, "latency_ms": latency_ms}
+        except Exception as e:
+            logger.error(f"Error queuing transaction: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Failed to queue transaction."
+            )
\ No newline at end of file
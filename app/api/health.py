@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+
+
+health_router = APIRouter()
+
+
+@health_router.get("/healthz", tags=["Health"])
+async def liveness_handler(request: Request):
+    """Liveness probe, reports the latest dependency latencies without checking them again."""
+    status_code, body = await request.app.state.health.liveness()
+    return JSONResponse(body, status_code=status_code)
+
+
+@health_router.get("/readyz", tags=["Health"])
+async def readiness_handler(request: Request):
+    """Readiness probe, 503 until warm-up finished or while a dependency check fails."""
+    status_code, body = await request.app.state.health.readiness()
+    return JSONResponse(body, status_code=status_code)
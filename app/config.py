@@ -4,20 +4,32 @@ from dotenv import load_dotenv
 
 load_dotenv(override=True, encoding="UTF-8")
 
-import os
 from dataclasses import dataclass, field
+from decimal import Decimal
+from functools import cached_property
+from ipaddress import IPv4Network, IPv6Network, ip_network
 
 
 @dataclass
 class DatabaseConfig:
-    user: str = os.getenv("DB_USER")
-    password: str = os.getenv("DB_PASSWORD")
-    host: str = os.getenv("DB_HOST")
-    port: str = os.getenv("DB_PORT")
-    name: str = (
+    user: str = field(default_factory=lambda: os.getenv("DB_USER"))
+    password: str = field(default_factory=lambda: os.getenv("DB_PASSWORD"))
+    host: str = field(default_factory=lambda: os.getenv("DB_HOST"))
+    port: str = field(default_factory=lambda: os.getenv("DB_PORT"))
+    name: str = field(default_factory=lambda: (
         os.getenv("DB_TEST_NAME") if os.getenv("IS_TESTING", "False").lower() == "true"
         else os.getenv("DB_NAME")
+    ))
+    bulk_batch_size: int = field(default_factory=lambda: int(os.getenv("DB_BULK_BATCH_SIZE", 1000)))
+    bootstrap: bool = field(default_factory=lambda: os.getenv("DB_BOOTSTRAP", "True").lower() == "true")
+    replica_hosts: list[str] = field(
+        default_factory=lambda: [host.strip() for host in os.getenv("DB_REPLICA_HOSTS", "").split(",") if host.strip()]
+    )
+    replica_max_lag: float = field(default_factory=lambda: float(os.getenv("DB_REPLICA_MAX_LAG", 5)))
+    replica_lag_check_interval: float = field(
+        default_factory=lambda: float(os.getenv("DB_REPLICA_LAG_CHECK_INTERVAL", 2))
     )
+    replica_check_timeout: float = field(default_factory=lambda: float(os.getenv("DB_REPLICA_CHECK_TIMEOUT", 1)))
 
     def __post_init__(self):
         if not self.user:
@@ -30,6 +42,14 @@ class DatabaseConfig:
             raise ValueError("DB_PORT is not set")
         if not self.name:
             raise ValueError("DB_NAME or DB_TEST_NAME is not set")
+        if self.bulk_batch_size < 1:
+            raise ValueError("DB_BULK_BATCH_SIZE must be at least 1")
+        if self.replica_max_lag < 0:
+            raise ValueError("DB_REPLICA_MAX_LAG must not be negative")
+        if self.replica_lag_check_interval <= 0:
+            raise ValueError("DB_REPLICA_LAG_CHECK_INTERVAL must be positive")
+        if self.replica_check_timeout <= 0:
+            raise ValueError("DB_REPLICA_CHECK_TIMEOUT must be positive")
 
 
     @property
@@ -40,25 +60,37 @@ class DatabaseConfig:
     def async_url(self) -> str:
         return f"postgresql+asyncpg://{self.user}:{self.password}@{self.host}:{self.port}/{self.name}"
 
+    @property
+    def replica_async_urls(self) -> list[str]:
+        """Replicas listed as host:port in DB_REPLICA_HOSTS, with the primary's credentials and database."""
+        return [f"postgresql+asyncpg://{self.user}:{self.password}@{host}/{self.name}" for host in self.replica_hosts]
+
+    @property
+    def maintenance_async_url(self) -> str:
+        return f"postgresql+asyncpg://{self.user}:{self.password}@{self.host}:{self.port}/postgres"
+
 
 @dataclass
 class RabbitMQConfig:
-    url: str = os.getenv("RABBITMQ_URL")
-    queue_name: str = os.getenv("QUEUE_NAME")
+    url: str = field(default_factory=lambda: os.getenv("RABBITMQ_URL"))
+    queue_name: str = field(default_factory=lambda: os.getenv("QUEUE_NAME"))
+    rpc_timeout: float = field(default_factory=lambda: float(os.getenv("RPC_TIMEOUT", 5)))
 
     def __post_init__(self):
         if not self.url:
             raise ValueError("RABBITMQ_URL is not set")
         if not self.queue_name:
             raise ValueError("QUEUE_NAME is not set")
+        if self.rpc_timeout <= 0:
+            raise ValueError("RPC_TIMEOUT must be positive")
 
 
 @dataclass
 class RedisConfig:
-    host: str = os.getenv("REDIS_HOST", "localhost")
-    port: int = int(os.getenv("REDIS_PORT", 6379))
-    db: int = int(os.getenv("REDIS_DB", 0))
-    password: str = os.getenv("REDIS_PASSWORD")
+    host: str = field(default_factory=lambda: os.getenv("REDIS_HOST", "localhost"))
+    port: int = field(default_factory=lambda: int(os.getenv("REDIS_PORT", 6379)))
+    db: int = field(default_factory=lambda: int(os.getenv("REDIS_DB", 0)))
+    password: str = field(default_factory=lambda: os.getenv("REDIS_PASSWORD"))
 
     def __post_init__(self):
         if not self.host:
@@ -73,9 +105,9 @@ class RedisConfig:
 
 @dataclass
 class APISettings:
-    token: str = os.getenv("API_TOKEN") 
-    ip: str = os.getenv("API_IP")
-    port: int = int(os.getenv("API_PORT", 8000))
+    token: str = field(default_factory=lambda: os.getenv("API_TOKEN"))
+    ip: str = field(default_factory=lambda: os.getenv("API_IP"))
+    port: int = field(default_factory=lambda: int(os.getenv("API_PORT", 8000)))
 
     def __post_init__(self):
         if not self.token:
@@ -87,12 +119,225 @@ class APISettings:
 
 
 @dataclass
+class TransferConfig:
+    concurrency_mode: str = field(
+        default_factory=lambda: os.getenv("TRANSFER_CONCURRENCY_MODE", "pessimistic").lower()
+    )
+    redis_locks: bool = field(default_factory=lambda: os.getenv("REDIS_LOCKS_ENABLED", "True").lower() == "true")
+    max_retries: int = field(default_factory=lambda: int(os.getenv("OPTIMISTIC_MAX_RETRIES", 5)))
+    backoff_base: float = field(default_factory=lambda: float(os.getenv("OPTIMISTIC_BACKOFF_BASE", 0.005)))
+    backoff_max: float = field(default_factory=lambda: float(os.getenv("OPTIMISTIC_BACKOFF_MAX", 0.1)))
+
+    def __post_init__(self):
+        if self.concurrency_mode not in ("pessimistic", "optimistic"):
+            raise ValueError("TRANSFER_CONCURRENCY_MODE must be pessimistic or optimistic")
+        if self.max_retries < 0:
+            raise ValueError("OPTIMISTIC_MAX_RETRIES must not be negative")
+        if self.backoff_base <= 0 or self.backoff_max < self.backoff_base:
+            raise ValueError("OPTIMISTIC_BACKOFF_BASE must be positive and not above OPTIMISTIC_BACKOFF_MAX")
+
+
+@dataclass
+class LedgerConfig:
+    enabled: bool = field(default_factory=lambda: os.getenv("LEDGER_MODE", "False").lower() == "true")
+    snapshot_interval: float = field(default_factory=lambda: float(os.getenv("LEDGER_SNAPSHOT_INTERVAL", 60)))
+
+    def __post_init__(self):
+        if self.snapshot_interval <= 0:
+            raise ValueError("LEDGER_SNAPSHOT_INTERVAL must be positive")
+
+
+@dataclass
+class ReconciliationConfig:
+    chunk_size: int = field(default_factory=lambda: int(os.getenv("RECONCILIATION_CHUNK_SIZE", 1000000)))
+    tolerance: Decimal = field(default_factory=lambda: Decimal(os.getenv("RECONCILIATION_TOLERANCE", "0")))
+
+    def __post_init__(self):
+        if self.chunk_size <= 0:
+            raise ValueError("RECONCILIATION_CHUNK_SIZE must be positive")
+        if self.tolerance < 0:
+            raise ValueError("RECONCILIATION_TOLERANCE must not be negative")
+
+
+@dataclass
+class PartitionConfig:
+    months_ahead: int = field(default_factory=lambda: int(os.getenv("PARTITION_MONTHS_AHEAD", 2)))
+    retention_months: int = field(default_factory=lambda: int(os.getenv("PARTITION_RETENTION_MONTHS", 0)))
+    archive_schema: str = field(default_factory=lambda: os.getenv("PARTITION_ARCHIVE_SCHEMA", "archive"))
+    maintenance_interval: float = field(
+        default_factory=lambda: float(os.getenv("PARTITION_MAINTENANCE_INTERVAL", 21600))
+    )
+
+    def __post_init__(self):
+        if self.months_ahead < 1:
+            raise ValueError("PARTITION_MONTHS_AHEAD must be at least 1")
+        if self.retention_months < 0:
+            raise ValueError("PARTITION_RETENTION_MONTHS must not be negative")
+        if not self.archive_schema:
+            raise ValueError("PARTITION_ARCHIVE_SCHEMA is not set")
+        if self.maintenance_interval <= 0:
+            raise ValueError("PARTITION_MAINTENANCE_INTERVAL must be positive")
+
+
+def _parse_networks(value: str) -> list[IPv4Network | IPv6Network]:
+    """Parses comma-separated addresses or CIDR ranges."""
+    return [ip_network(part.strip(), strict=False) for part in value.split(",") if part.strip()]
+
+
+def _parse_sample_rates(value: str) -> dict[str, float]:
+    """Parses "event=rate,event=rate" into a mapping."""
+    rates = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        event, _, rate = item.partition("=")
+        rates[event.strip()] = float(rate)
+    return rates
+
+
+@dataclass
+class LoggingConfig:
+    level: str = field(default_factory=lambda: os.getenv("LOG_LEVEL", "INFO").upper())
+    json: bool = field(default_factory=lambda: os.getenv("LOG_JSON", "False").lower() == "true")
+    enqueue: bool = field(default_factory=lambda: os.getenv("LOG_ENQUEUE", "True").lower() == "true")
+    sample_rates: dict[str, float] = field(
+        default_factory=lambda: _parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", ""))
+    )
+
+    def __post_init__(self):
+        if not self.level:
+            raise ValueError("LOG_LEVEL is not set")
+        for event, rate in self.sample_rates.items():
+            if not 0 <= rate <= 1:
+                raise ValueError(f"LOG_SAMPLE_RATES rate for {event} must be between 0 and 1")
+
+
+@dataclass
+class TracingConfig:
+    enabled: bool = field(default_factory=lambda: os.getenv("TRACING_ENABLED", "False").lower() == "true")
+    exporter: str = field(default_factory=lambda: os.getenv("TRACING_EXPORTER", "file").lower())
+    file: str = field(default_factory=lambda: os.getenv("TRACING_FILE", "traces.jsonl"))
+    otlp_endpoint: str = field(
+        default_factory=lambda: os.getenv("TRACING_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+    )
+    sample_rate: float = field(default_factory=lambda: float(os.getenv("TRACING_SAMPLE_RATE", 1)))
+    export_interval: float = field(default_factory=lambda: float(os.getenv("TRACING_EXPORT_INTERVAL", 1)))
+    max_queue: int = field(default_factory=lambda: int(os.getenv("TRACING_MAX_QUEUE", 10000)))
+
+    def __post_init__(self):
+        if self.exporter not in ("file", "otlp"):
+            raise ValueError("TRACING_EXPORTER must be file or otlp")
+        if not 0 <= self.sample_rate <= 1:
+            raise ValueError("TRACING_SAMPLE_RATE must be between 0 and 1")
+        if self.export_interval <= 0:
+            raise ValueError("TRACING_EXPORT_INTERVAL must be positive")
+
+
+@dataclass
+class AdmissionConfig:
+    enabled: bool = field(default_factory=lambda: os.getenv("ADMISSION_ENABLED", "False").lower() == "true")
+    sample_interval: float = field(default_factory=lambda: float(os.getenv("ADMISSION_SAMPLE_INTERVAL", 1)))
+    shed_queue_depth: int = field(default_factory=lambda: int(os.getenv("ADMISSION_SHED_QUEUE_DEPTH", 5000)))
+    max_queue_depth: int = field(default_factory=lambda: int(os.getenv("ADMISSION_MAX_QUEUE_DEPTH", 20000)))
+    max_backlog_seconds: float = field(
+        default_factory=lambda: float(os.getenv("ADMISSION_MAX_BACKLOG_SECONDS", 30))
+    )
+    max_retry_after: int = field(default_factory=lambda: int(os.getenv("ADMISSION_MAX_RETRY_AFTER", 60)))
+    stall_seconds: float = field(default_factory=lambda: float(os.getenv("ADMISSION_STALL_SECONDS", 10)))
+    client_rate: float = field(default_factory=lambda: float(os.getenv("ADMISSION_CLIENT_RATE", 0)))
+    client_burst: int = field(default_factory=lambda: int(os.getenv("ADMISSION_CLIENT_BURST", 20)))
+    # proxies whose X-Forwarded-For entries are believed, empty to key rate limits on the peer address
+    trusted_proxies: list[IPv4Network | IPv6Network] = field(
+        default_factory=lambda: _parse_networks(os.getenv("ADMISSION_TRUSTED_PROXIES", ""))
+    )
+
+    def __post_init__(self):
+        if self.sample_interval <= 0:
+            raise ValueError("ADMISSION_SAMPLE_INTERVAL must be positive")
+        if not 0 <= self.shed_queue_depth < self.max_queue_depth:
+            raise ValueError("ADMISSION_SHED_QUEUE_DEPTH must be below ADMISSION_MAX_QUEUE_DEPTH")
+        if self.max_backlog_seconds <= 0:
+            raise ValueError("ADMISSION_MAX_BACKLOG_SECONDS must be positive")
+        if self.max_retry_after < 1:
+            raise ValueError("ADMISSION_MAX_RETRY_AFTER must be at least 1")
+        if self.stall_seconds <= 0:
+            raise ValueError("ADMISSION_STALL_SECONDS must be positive")
+        if self.client_rate < 0:
+            raise ValueError("ADMISSION_CLIENT_RATE must not be negative")
+        if self.client_burst < 1:
+            raise ValueError("ADMISSION_CLIENT_BURST must be at least 1")
+
+
+@dataclass
+class HealthConfig:
+    warmup_db_connections: int = field(default_factory=lambda: int(os.getenv("WARMUP_DB_CONNECTIONS", 5)))
+    warmup_redis_connections: int = field(default_factory=lambda: int(os.getenv("WARMUP_REDIS_CONNECTIONS", 5)))
+    check_timeout: float = field(default_factory=lambda: float(os.getenv("HEALTH_CHECK_TIMEOUT", 2)))
+    worker_host: str = field(default_factory=lambda: os.getenv("WORKER_HEALTH_HOST", "0.0.0.0"))
+    worker_port: int = field(default_factory=lambda: int(os.getenv("WORKER_HEALTH_PORT", 8001)))
+
+    def __post_init__(self):
+        if self.warmup_db_connections < 0:
+            raise ValueError("WARMUP_DB_CONNECTIONS must not be negative")
+        if self.warmup_redis_connections < 0:
+            raise ValueError("WARMUP_REDIS_CONNECTIONS must not be negative")
+        if self.check_timeout <= 0:
+            raise ValueError("HEALTH_CHECK_TIMEOUT must be positive")
+
+
 class Settings:
-    is_testing: bool = os.getenv("IS_TESTING", "False").lower() == "true"
-    db: DatabaseConfig = field(default_factory=lambda: DatabaseConfig())
-    rabbitmq: RabbitMQConfig = field(default_factory=lambda: RabbitMQConfig())
-    redis: RedisConfig = field(default_factory=lambda:  RedisConfig())
-    api: APISettings = field(default_factory=lambda: APISettings())
+    """Subsystem settings are read and validated on first access,
+    so a process only needs the environment of the subsystems it uses."""
+
+    @cached_property
+    def is_testing(self) -> bool:
+        return os.getenv("IS_TESTING", "False").lower() == "true"
+
+    @cached_property
+    def db(self) -> DatabaseConfig:
+        return DatabaseConfig()
+
+    @cached_property
+    def rabbitmq(self) -> RabbitMQConfig:
+        return RabbitMQConfig()
+
+    @cached_property
+    def redis(self) -> RedisConfig:
+        return RedisConfig()
+
+    @cached_property
+    def api(self) -> APISettings:
+        return APISettings()
+
+    @cached_property
+    def transfer(self) -> TransferConfig:
+        return TransferConfig()
+
+    @cached_property
+    def ledger(self) -> LedgerConfig:
+        return LedgerConfig()
+
+    @cached_property
+    def partitions(self) -> PartitionConfig:
+        return PartitionConfig()
+
+    @cached_property
+    def reconciliation(self) -> ReconciliationConfig:
+        return ReconciliationConfig()
+
+    @cached_property
+    def admission(self) -> AdmissionConfig:
+        return AdmissionConfig()
+
+    @cached_property
+    def health(self) -> HealthConfig:
+        return HealthConfig()
+
+    @cached_property
+    def logging(self) -> LoggingConfig:
+        return LoggingConfig()
+
+    @cached_property
+    def tracing(self) -> TracingConfig:
+        return TracingConfig()
 
 
 settings = Settings()
@@ -1,25 +1,55 @@
+import asyncio
+import random
+from contextlib import nullcontext
+from datetime import datetime
 from decimal import Decimal
 from typing import Sequence
 
-from sqlalchemy import func, select
+from sqlalchemy import func, insert, literal, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.exc import StaleDataError
 
-from app.database.models import Transaction, User
+from app.database.database import AsyncSessionManager
+from app.database.models import BalanceSnapshot, LedgerEntry, Transaction, User
+from app.config import settings
 from app.schemas.transaction import TransactionCreate
+from app.services.tracing import tracer
 
+# Two-int advisory key, so it never collides with the bigint per-sender locks. Every transfer
+# holds it shared; once a watermark reader is granted it exclusively, no transfer that may
+# have taken an id is still in flight.
+TRANSFER_BARRIER_LOCK = (0x4C454447, 1)
+# held by the compactor for its whole snapshot transaction, so two compactors never interleave
+SNAPSHOT_LOCK = (0x4C454447, 2)
 
-class CRUDUsers:
-    def __init__(self, session: AsyncSession):
+
+class CRUDBase:
+    def __init__(self, session: AsyncSession, session_manager: AsyncSessionManager | None = None):
         self.session = session
+        self.session_manager = session_manager
+
+    def _reader(self):
+        """Session for read-only queries: a replica session if replicas are configured, else our own."""
+        if self.session_manager is None or not self.session_manager.replicas:
+            return nullcontext(self.session)
+        return self.session_manager.read_session()
+
+
+class CRUDUsers(CRUDBase):
 
     async def get_user_by_id(self, user_id: int) -> User | None:
         user = await self.session.execute(select(User).where(User.id == user_id))
         return user.scalar_one_or_none()
     
     async def get_user_by_data(self, username: str, password: str) -> User | None:
-        user = await self.session.execute(select(User).where(User.username == username,
-                                                             User.password == password))
-        return user.scalar_one_or_none()
+        query = select(User).where(User.username == username, User.password == password)
+        async with self._reader() as session:
+            user = (await session.execute(query)).scalar_one_or_none()
+        if user is None and session is not self.session:
+            # a user registered moments ago may not have reached the replica yet
+            user = (await self.session.execute(query)).scalar_one_or_none()
+        return user
 
     async def create_user(self, username: str, password: str) -> User:
         user = User(username=username, password=password)
@@ -29,28 +59,71 @@ class CRUDUsers:
         except Exception as e:
             await self.session.rollback()
             raise e
-        await self.session.refresh(user)
         return user
 
-    async def get_total_sent_amount(self, user_id: int) -> float:
-        result = await self.session.execute(
-            select(func.sum(Transaction.amount)).where(Transaction.sender_id == user_id)
+    async def create_users_bulk(self, users: Sequence[tuple[str, str]]) -> dict[str, int]:
+        """Inserts (username, password) pairs in one statement, returns the ids of the created usernames.
+
+        Usernames that already exist are skipped, so they are missing from the result.
+        """
+        if not users:
+            return {}
+        query = (
+            pg_insert(User)
+            .values([{"username": username, "password": password} for username, password in users])
+            .on_conflict_do_nothing(index_elements=[User.username])
+            .returning(User.username, User.id)
         )
-        return result.scalar() or 0
+        try:
+            result = await self.session.execute(query)
+            created = {username: user_id for username, user_id in result.all()}
+            await self.session.commit()
+        except Exception as e:
+            await self.session.rollback()
+            raise e
+        return created
+
+    async def get_total_sent_amount(self, user_id: int) -> float:
+        async with self._reader() as session:
+            result = await session.execute(
+                select(func.sum(Transaction.amount)).where(Transaction.sender_id == user_id)
+            )
+            return result.scalar() or 0
 
     async def get_all_users(self) -> Sequence[User]:
-        result = await self.session.execute(select(User))
-        return result.scalars().all()
+        async with self._reader() as session:
+            result = await session.execute(select(User))
+            return result.scalars().all()
     
 
-class CRUDTransactions:
-    def __init__(self, session: AsyncSession):
-        self.session = session
+class CRUDTransactions(CRUDBase):
 
     async def create_transaction(self, transaction: TransactionCreate) -> None:
+        await self._transfer(transaction, lock_rows=True)
+
+    async def _transfer(self, transaction: TransactionCreate, lock_rows: bool) -> None:
+        """Moves the amount between both user rows and records the transaction in one commit.
+
+        With `lock_rows` the rows are read FOR UPDATE in ascending id order, so opposite
+        transfers between the same users cannot deadlock even without Redis locks; without,
+        the cached copies are refreshed and the version check of the UPDATEs detects
+        concurrent changes.
+        """
+        query = (
+            select(User)
+            .where(User.id.in_((transaction.sender_id, transaction.receiver_id)))
+            .order_by(User.id)
+        )
+        if lock_rows:
+            span, query = "db.lock_rows", query.with_for_update()
+        else:
+            span, query = "db.read_rows", query.execution_options(populate_existing=True)
         async with self.session.begin():
-            sender = await self.session.get(User, transaction.sender_id, with_for_update=True)
-            receiver = await self.session.get(User, transaction.receiver_id, with_for_update=True)
+            with tracer.span(span):
+                # taken before the insert allocates ids, see TRANSFER_BARRIER_LOCK
+                await self.session.execute(select(func.pg_advisory_xact_lock_shared(*TRANSFER_BARRIER_LOCK)))
+                users = {user.id: user for user in (await self.session.execute(query)).scalars()}
+            sender, receiver = users.get(transaction.sender_id), users.get(transaction.receiver_id)
             try:
                 if not sender or not receiver:
                     raise ValueError("Sender or receiver does not exist")
@@ -65,15 +138,161 @@ class CRUDTransactions:
                     amount=transaction.amount
                 )
                 self.session.add(new_transaction)
-                await self.session.commit()
+                with tracer.span("db.commit"):
+                    await self.session.commit()
             except Exception as e:
                 await self.session.rollback()
                 raise e
 
-    async def get_transactions_by_user(self, user_id: int) -> Sequence[Transaction]:
-        result = await self.session.execute(
-            select(Transaction).where(
-                (Transaction.sender_id == user_id) | (Transaction.receiver_id == user_id)
+    async def get_transactions_by_user(self, user_id: int,
+                                       since: datetime | None = None,
+                                       until: datetime | None = None) -> Sequence[Transaction]:
+        """Transactions of a user, `since`/`until` bound created_at so only matching partitions are scanned."""
+        query = select(Transaction).where(
+            (Transaction.sender_id == user_id) | (Transaction.receiver_id == user_id)
+        )
+        if since is not None:
+            query = query.where(Transaction.created_at >= since)
+        if until is not None:
+            query = query.where(Transaction.created_at < until)
+        async with self._reader() as session:
+            result = await session.execute(query)
+            return result.scalars().all()
+
+
+class CRUDOptimisticTransactions(CRUDTransactions):
+    """Transfers without row locks: both balance UPDATEs are compare-and-swap on users.version.
+
+    When another transfer changed one of the users first, the commit raises StaleDataError
+    and the transfer is retried with full-jitter exponential backoff, at most max_retries times.
+    """
+
+    def __init__(self, session: AsyncSession, max_retries: int | None = None,
+                 backoff_base: float | None = None, backoff_max: float | None = None):
+        super().__init__(session)
+        self.max_retries = settings.transfer.max_retries if max_retries is None else max_retries
+        self.backoff_base = backoff_base or settings.transfer.backoff_base
+        self.backoff_max = backoff_max or settings.transfer.backoff_max
+
+    async def create_transaction(self, transaction: TransactionCreate) -> None:
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await self._transfer(transaction, lock_rows=False)
+            except StaleDataError:
+                if attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt)))
+
+
+class CRUDLedger(CRUDTransactions):
+    """Append-only transfers: balances are the latest snapshot plus the ledger entries after it.
+
+    `users.balance` is only read as the opening balance of users without a snapshot,
+    so a transfer never updates a user row.
+    """
+
+    @staticmethod
+    def _balance_query(user_id: int):
+        latest = (
+            select(BalanceSnapshot)
+            .where(BalanceSnapshot.user_id == user_id)
+            .order_by(BalanceSnapshot.last_entry_id.desc())
+            .limit(1)
+        )
+        snapshot_balance = latest.with_only_columns(BalanceSnapshot.balance).scalar_subquery()
+        snapshot_entry_id = latest.with_only_columns(BalanceSnapshot.last_entry_id).scalar_subquery()
+        entries_total = (
+            select(func.coalesce(func.sum(LedgerEntry.amount), 0))
+            .where(LedgerEntry.user_id == user_id,
+                   LedgerEntry.id > func.coalesce(snapshot_entry_id, 0))
+            .scalar_subquery()
+        )
+        return select(func.coalesce(snapshot_balance, User.balance) + entries_total).where(User.id == user_id)
+
+    async def get_balance(self, user_id: int) -> Decimal | None:
+        result = await self.session.execute(self._balance_query(user_id))
+        return result.scalar_one_or_none()
+
+    async def create_transaction(self, transaction: TransactionCreate) -> None:
+        async with self.session.begin():
+            with tracer.span("db.advisory_lock"):
+                # taken before the insert allocates ids, see TRANSFER_BARRIER_LOCK
+                await self.session.execute(select(func.pg_advisory_xact_lock_shared(*TRANSFER_BARRIER_LOCK)))
+                # serialises debits of one sender without locking or updating its row
+                await self.session.execute(select(func.pg_advisory_xact_lock(transaction.sender_id)))
+            try:
+                with tracer.span("db.ledger_balance"):
+                    sender_balance = await self.get_balance(transaction.sender_id)
+                    receiver = await self.session.execute(select(User.id).where(User.id == transaction.receiver_id))
+                if sender_balance is None or receiver.scalar_one_or_none() is None:
+                    raise ValueError("Sender or receiver does not exist")
+                amount = Decimal(str(transaction.amount))
+                if sender_balance < amount:
+                    raise ValueError("Insufficient balance")
+                new_transaction = Transaction(
+                    sender_id=transaction.sender_id,
+                    receiver_id=transaction.receiver_id,
+                    amount=transaction.amount
+                )
+                self.session.add(new_transaction)
+                await self.session.flush()
+                self.session.add_all([
+                    LedgerEntry(transaction_id=new_transaction.id, user_id=transaction.sender_id, amount=-amount),
+                    LedgerEntry(transaction_id=new_transaction.id, user_id=transaction.receiver_id, amount=amount),
+                ])
+                with tracer.span("db.commit"):
+                    await self.session.commit()
+            except Exception as e:
+                await self.session.rollback()
+                raise e
+
+    async def settled_entry_id(self) -> int:
+        """Highest ledger entry id below which every entry is committed or rolled back.
+
+        The exclusive barrier lock waits for in-flight transfers only, and ids are taken
+        after the shared lock, so no entry at or below the returned id can appear later.
+        """
+        async with self.session.begin():
+            await self.session.execute(select(func.pg_advisory_xact_lock(*TRANSFER_BARRIER_LOCK)))
+            # READ COMMITTED: this statement's snapshot is taken after the lock was granted
+            high = (await self.session.execute(select(func.coalesce(func.max(LedgerEntry.id), 0)))).scalar_one()
+            await self.session.commit()
+        return high
+
+    async def write_snapshots(self) -> int:
+        """Snapshot every user with entries since the previous run, returns the number of snapshots."""
+        high = await self.settled_entry_id()
+        async with self.session.begin():
+            await self.session.execute(select(func.pg_advisory_xact_lock(*SNAPSHOT_LOCK)))
+            low = (await self.session.execute(
+                select(func.coalesce(func.max(BalanceSnapshot.last_entry_id), 0))
+            )).scalar_one()
+            if high <= low:
+                return 0
+
+            deltas = (
+                select(LedgerEntry.user_id, func.sum(LedgerEntry.amount).label("delta"))
+                .where(LedgerEntry.id > low, LedgerEntry.id <= high)
+                .group_by(LedgerEntry.user_id)
+                .subquery()
             )
+            previous = (
+                select(BalanceSnapshot.balance)
+                # a snapshot past `low` already covers some of these deltas
+                .where(BalanceSnapshot.user_id == deltas.c.user_id, BalanceSnapshot.last_entry_id <= low)
+                .order_by(BalanceSnapshot.last_entry_id.desc())
+                .limit(1)
+                .scalar_subquery()
             )
-        return result.scalars().all()
\ No newline at end of file
+            result = await self.session.execute(
+                insert(BalanceSnapshot).from_select(
+                    ["user_id", "balance", "last_entry_id"],
+                    select(
+                        deltas.c.user_id,
+                        func.coalesce(previous, User.balance) + deltas.c.delta,
+                        literal(high),
+                    ).join(User, User.id == deltas.c.user_id),
+                )
+            )
+            await self.session.commit()
+            return result.rowcount
@@ -1,39 +1,141 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
-from sqlalchemy_utils import create_database, database_exists # type: ignore
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
 
 from loguru import logger
 
-from app.config import settings
+from app.config import DatabaseConfig, settings
 from app.database.models import Base
 
+# seconds the replica is behind, 0 when it has replayed everything it received. NULL (unusable)
+# when it is not a streaming standby: with the WAL receiver down, equal LSNs only mean it
+# replayed what it got before the disconnect. Without pg_read_all_stats the status column
+# is NULL, and only a running WAL receiver is required.
+REPLICA_LAG_QUERY = (
+    "SELECT CASE "
+    "WHEN NOT pg_is_in_recovery() THEN NULL "
+    "WHEN NOT EXISTS (SELECT 1 FROM pg_stat_wal_receiver "
+    "WHERE coalesce(status, 'streaming') = 'streaming') THEN NULL "
+    "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
 
 
 class InitDB:
-    def __init__(self):
-        self.custom_create_database()
+    """Creates the application database if it is missing, run at startup unless DB_BOOTSTRAP=False."""
+
+    def __init__(self, db: DatabaseConfig | None = None):
+        self.db = db or settings.db
 
-    def custom_create_database(self):
-        url = settings.db.sync_url
+    async def custom_create_database(self):
+        engine = create_async_engine(self.db.maintenance_async_url,
+                                     isolation_level="AUTOCOMMIT", poolclass=NullPool)
         try:
-            if not database_exists(url):
-                create_database(url)
-                logger.success("Database created!")
-            else:
-                logger.info("Database already exists.")
+            async with engine.connect() as conn:
+                exists = await conn.scalar(text("SELECT 1 FROM pg_database WHERE datname = :name"),
+                                           {"name": self.db.name})
+                if not exists:
+                    await conn.execute(text(f'CREATE DATABASE "{self.db.name}"'))
+                    logger.success("Database created!")
+                else:
+                    logger.info("Database already exists.")
         except Exception as e:
             logger.error(f"Failed to create or check database: {e}")
             raise
+        finally:
+            await engine.dispose()
+
+
+class ReplicaEngine:
+    """Replica engine with its last measured replication lag."""
+
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine
+        self.lag = float("inf")
+        self.checked_at = float("-inf")
 
 
 class AsyncSessionManager:
-    def __init__(self, db_url: str = settings.db.async_url):
-        self.engine = create_async_engine(db_url, echo=False)
+    """Primary engine for writes plus optional replica engines for read-only queries.
+
+    Reads go round-robin to replicas whose replication lag is at most max_lag seconds
+    and fall back to the primary. Lag is measured by a background task every
+    lag_check_interval seconds, so a hanging replica never blocks a read; a replica
+    whose last successful measurement is older than three intervals is skipped.
+    """
+
+    def __init__(self, db_url: str | None = None, replica_urls: list[str] | None = None,
+                 max_lag: float | None = None, lag_check_interval: float | None = None,
+                 check_timeout: float | None = None):
+        self.engine = create_async_engine(db_url or settings.db.async_url, echo=False)
         self._sessionmaker = async_sessionmaker(
             bind=self.engine,
             class_=AsyncSession,
             expire_on_commit=False
         )
+        self.check_timeout = check_timeout or settings.db.replica_check_timeout
+        replica_urls = settings.db.replica_async_urls if replica_urls is None else replica_urls
+        # bounded connect, asyncpg waits 60 seconds by default
+        self.replicas = [
+            ReplicaEngine(create_async_engine(url, echo=False, connect_args={"timeout": self.check_timeout}))
+            for url in replica_urls
+        ]
+        self.max_lag = settings.db.replica_max_lag if max_lag is None else max_lag
+        self.lag_check_interval = (settings.db.replica_lag_check_interval if lag_check_interval is None
+                                   else lag_check_interval)
+        self._next_replica = 0
+        self._lag_task: asyncio.Task | None = None
 
     def get_session(self) -> AsyncSession:
         return self._sessionmaker()
 
+    @staticmethod
+    async def _measure_lag(replica: ReplicaEngine):
+        async with replica.engine.connect() as conn:
+            return await conn.scalar(text(REPLICA_LAG_QUERY))
+
+    async def _refresh_lag(self, replica: ReplicaEngine):
+        try:
+            lag = await asyncio.wait_for(self._measure_lag(replica), timeout=self.check_timeout)
+            replica.lag = float("inf") if lag is None else float(lag)
+        except Exception as e:
+            logger.warning(f"Replica {replica.engine.url.host} is unavailable: {e!r}")
+            replica.lag = float("inf")
+        replica.checked_at = time.monotonic()
+
+    async def _monitor_lag(self):
+        while True:
+            await asyncio.gather(*(self._refresh_lag(replica) for replica in self.replicas))
+            await asyncio.sleep(self.lag_check_interval)
+
+    def start_lag_monitor(self):
+        """Starts measuring replica lag in the background; called on the first read if not started."""
+        if self.replicas and self._lag_task is None:
+            self._lag_task = asyncio.create_task(self._monitor_lag())
+
+    async def stop_lag_monitor(self):
+        if self._lag_task is not None:
+            self._lag_task.cancel()
+            self._lag_task = None
+
+    def get_read_engine(self) -> AsyncEngine:
+        """Next replica within the lag threshold, or the primary if there is none."""
+        self.start_lag_monitor()
+        fresh_after = time.monotonic() - 3 * self.lag_check_interval
+        for _ in range(len(self.replicas)):
+            replica = self.replicas[self._next_replica % len(self.replicas)]
+            self._next_replica += 1
+            if replica.checked_at >= fresh_after and replica.lag <= self.max_lag:
+                return replica.engine
+        return self.engine
+
+    @asynccontextmanager
+    async def read_session(self) -> AsyncIterator[AsyncSession]:
+        """Short-lived session on a replica for read-only queries."""
+        async with AsyncSession(bind=self.get_read_engine(), expire_on_commit=False) as session:
+            yield session
@@ -1,7 +1,8 @@
+from datetime import datetime
 from decimal import Decimal
 from typing import List
 
-from sqlalchemy import ForeignKey, Numeric, String
+from sqlalchemy import BigInteger, DateTime, ForeignKey, Index, Integer, Numeric, String, func
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 
@@ -15,6 +16,8 @@ class User(Base):
     username: Mapped[str] = mapped_column(String, unique=True, nullable=False)
     password: Mapped[str] = mapped_column(String, nullable=False)
     balance: Mapped[Decimal] = mapped_column(Numeric(12, 2), default=0, nullable=False)
+    # bumped by every ORM UPDATE, which then only matches if the version is unchanged
+    version: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
 
     sent_transactions: Mapped[List["Transaction"]] = relationship(
         back_populates="sender",
@@ -25,10 +28,15 @@ class User(Base):
         foreign_keys="[Transaction.receiver_id]",
     )
 
+    __mapper_args__ = {"version_id_col": version}
+
 class Transaction(Base):
     __tablename__ = "transactions"
 
-    id: Mapped[int] = mapped_column(primary_key=True)
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    # partition key, so it has to be part of the primary key
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True,
+                                                 server_default=func.now())
     sender_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
     receiver_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
     amount: Mapped[float] = mapped_column(Numeric(12, 2))
@@ -40,4 +48,62 @@ class Transaction(Base):
     receiver: Mapped[User] = relationship(
         back_populates="received_transactions",
         foreign_keys=[receiver_id]
-    )   
+    )
+
+    __table_args__ = (
+        Index("ix_transactions_sender_id_created_at", "sender_id", "created_at"),
+        Index("ix_transactions_receiver_id_created_at", "receiver_id", "created_at"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+
+class LedgerEntry(Base):
+    """Signed debit/credit line of a transfer, used as the balance source in ledger mode."""
+    __tablename__ = "ledger_entries"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    # plain column, no FK: keeps the append path free of lookups into transactions
+    transaction_id: Mapped[int] = mapped_column(nullable=False)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
+    amount: Mapped[Decimal] = mapped_column(Numeric(12, 2), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(),
+                                                 nullable=False)
+
+    __table_args__ = (
+        Index("ix_ledger_entries_user_id_id", "user_id", "id"),
+    )
+
+
+class BalanceSnapshot(Base):
+    """Balance of a user covering every ledger entry up to last_entry_id."""
+    __tablename__ = "balance_snapshots"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
+    balance: Mapped[Decimal] = mapped_column(Numeric(12, 2), nullable=False)
+    last_entry_id: Mapped[int] = mapped_column(BigInteger, nullable=False, index=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(),
+                                                 nullable=False)
+
+    __table_args__ = (
+        Index("ix_balance_snapshots_user_id_last_entry_id", "user_id", "last_entry_id"),
+    )
+
+
+class ReconciliationState(Base):
+    """Id of the last transaction already folded into reconciliation_balances."""
+    __tablename__ = "reconciliation_state"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    watermark: Mapped[int] = mapped_column(BigInteger, default=0, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(),
+                                                 onupdate=func.now(), nullable=False)
+
+
+class ReconciliationBalance(Base):
+    """Per-user audit state: opening balance (0 unless baselined) and the net flow up to the watermark."""
+    __tablename__ = "reconciliation_balances"
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), primary_key=True)
+    opening_balance: Mapped[Decimal] = mapped_column(Numeric(20, 2), nullable=False)
+    net_flow: Mapped[Decimal] = mapped_column(Numeric(20, 2), default=0, nullable=False)
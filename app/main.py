@@ -4,20 +4,49 @@ from loguru import logger
 import uvicorn
 
 from app.config import settings
-from app.api.handlers import main_router
+from app.api.handlers import dependencies, main_router
+from app.api.health import health_router
 from app.database.database import InitDB
+from app.services.admission import AdmissionController, QueueMonitor
+from app.services.health import HealthChecker
+from app.services.log import setup_logging
 from app.services.rabbitmq import rabbitmq
+from app.services.redis_lock import get_redis_client
+from app.services.tracing import tracer
 
-InitDB()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    setup_logging()
+    tracer.setup("api")
+    if settings.db.bootstrap:
+        await InitDB().custom_create_database()
+    # the API only talks to Redis for per-client rate limits
+    rate_limited = settings.admission.enabled and settings.admission.client_rate > 0
+    redis_client = get_redis_client() if rate_limited else None
+    session_manager = dependencies.session_manager
+    app.state.health = HealthChecker(engine=session_manager.engine, redis_client=redis_client,
+                                     rabbitmq_client=rabbitmq,
+                                     replicas=[replica.engine for replica in session_manager.replicas])
+    session_manager.start_lag_monitor()
     await rabbitmq.connect()
+    await app.state.health.warm_up()
+    monitor = None
+    if settings.admission.enabled:
+        monitor = QueueMonitor(rabbitmq)
+        monitor.start()
+        app.state.admission = AdmissionController(monitor, redis_client)
     yield
+    if monitor is not None:
+        await monitor.stop()
+    await app.state.health.close()
+    await session_manager.stop_lag_monitor()
     await rabbitmq.close()
+    await tracer.shutdown()
 
 app = FastAPI(lifespan=lifespan)
 app.include_router(main_router)
+app.include_router(health_router)
 
 if __name__ == "__main__":
     try:
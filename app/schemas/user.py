@@ -6,4 +6,15 @@ class UserData(BaseModel):
     password: str
     class Config:
         from_attributes = True
-        arbitrary_types_allowed = True
\ No newline at end of file
+        arbitrary_types_allowed = True
+
+class BulkRowIssue(BaseModel):
+    line: int
+    username: str | None = None
+    detail: str
+
+
+class BulkRegistrationReport(BaseModel):
+    created: int = 0
+    conflicts: list[BulkRowIssue] = []
+    invalid: list[BulkRowIssue] = []
@@ -0,0 +1,190 @@
+import asyncio
+import math
+import random
+import time
+from ipaddress import IPv4Network, IPv6Network, ip_address
+
+import redis.asyncio as redis
+from fastapi import HTTPException, Request, status
+from loguru import logger
+
+from app.config import AdmissionConfig, settings
+from app.services.rabbitmq import RabbitMQClient
+
+# token bucket per client: refills `rate` tokens per second up to `burst`,
+# returns {allowed, seconds until the next token}; uses the Redis clock so API hosts agree
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return {allowed, tostring(wait)}
+"""
+
+
+class QueueMonitor:
+    """Samples the transactions queue depth and its drain rate in the background.
+
+    Depth comes from a passive queue declare on a dedicated channel, so a missing queue
+    cannot close the publishing channel. The drain rate is derived from the depth change
+    and the messages this process published since the last sample, smoothed with an EWMA;
+    with several API instances it underestimates the real rate, which errs on the safe side.
+    `drained_at` is the last sample that saw the queue empty or shrinking beyond our own
+    publishes, so stalled workers show up even while the smoothed rate decays.
+    """
+
+    def __init__(self, rabbitmq_client: RabbitMQClient, interval: float | None = None, smoothing: float = 0.3):
+        self.rabbitmq_client = rabbitmq_client
+        self.interval = interval or settings.admission.sample_interval
+        self.smoothing = smoothing
+        self.depth: int | None = None
+        self.drain_rate = 0.0
+        self.sampled_at = 0.0
+        self.drained_at: float | None = None
+        self._published = 0
+        self._channel = None
+        self._task: asyncio.Task | None = None
+
+    async def sample(self):
+        if self._channel is None or self._channel.is_closed:
+            self._channel = await self.rabbitmq_client.connection.channel()
+        # robust=False: a robust channel keeps every declared queue for restore, one per sample
+        queue = await self._channel.declare_queue(self.rabbitmq_client.queue_name, passive=True, robust=False)
+        depth = queue.declaration_result.message_count
+        now = time.monotonic()
+        published, self._published = self.rabbitmq_client.published - self._published, self.rabbitmq_client.published
+        drained = 0.0
+        if self.depth is not None:
+            drained = max(0.0, (self.depth + published - depth) / (now - self.sampled_at))
+            self.drain_rate += self.smoothing * (drained - self.drain_rate)
+        if depth == 0 or drained > 0 or self.drained_at is None:
+            self.drained_at = now
+        self.depth, self.sampled_at = depth, now
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sample()
+            except Exception as e:
+                logger.warning(f"Error sampling queue depth: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._channel is not None and not self._channel.is_closed:
+            await self._channel.close()
+
+    def is_fresh(self) -> bool:
+        return self.depth is not None and time.monotonic() - self.sampled_at < 3 * self.interval
+
+    def stalled_for(self) -> float:
+        """Seconds the queue has been non-empty without draining."""
+        return 0.0 if self.drained_at is None else self.sampled_at - self.drained_at
+
+
+def client_address(request: Request, trusted_proxies: list[IPv4Network | IPv6Network]) -> str:
+    """Address a request is rate-limited by.
+
+    The peer address, unless it is a trusted proxy: then X-Forwarded-For is walked from
+    the right and the first hop not added by a trusted proxy is used. Entries left of it
+    are client-supplied and never choose the bucket.
+    """
+    peer = request.client.host if request.client else "unknown"
+    if not trusted_proxies:
+        return peer
+    forwarded = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+    hops = forwarded + [peer]
+    for hop in reversed(hops):
+        try:
+            address = ip_address(hop)
+        except ValueError:
+            return hop
+        if not any(address in network for network in trusted_proxies):
+            return hop
+    return hops[0]
+
+
+class AdmissionController:
+    """Rejects or sheds new transfers with 429 and Retry-After while the queue is too far behind.
+
+    Between the shed and max depths requests are dropped with a probability growing
+    linearly to 1; past the max depth or the max backlog (depth / drain rate) all are, as
+    they are once the queue has not drained for stall_seconds (workers stopped consuming).
+    Stale samples admit everything, so a monitoring failure does not stop traffic.
+    """
+
+    def __init__(self, monitor: QueueMonitor, redis_client: redis.Redis | None = None,
+                 config: AdmissionConfig | None = None):
+        self.monitor = monitor
+        self.config = config or settings.admission
+        self.redis_client = redis_client if self.config.client_rate > 0 else None
+        self._token_bucket = redis_client.register_script(TOKEN_BUCKET_SCRIPT) if self.redis_client else None
+
+    def _retry_after(self, excess: float) -> int:
+        rate = self.monitor.drain_rate
+        seconds = excess / rate if rate > 0 else self.config.max_retry_after
+        return max(1, min(self.config.max_retry_after, math.ceil(seconds)))
+
+    def check_backlog(self) -> int | None:
+        """Seconds to wait before retrying when the queue rejects the request, None to admit it."""
+        if not self.monitor.is_fresh():
+            return None
+        depth, rate = self.monitor.depth, self.monitor.drain_rate
+        if depth >= self.config.max_queue_depth:
+            return self._retry_after(depth - self.config.shed_queue_depth)
+        if depth > 0 and self.monitor.stalled_for() > self.config.stall_seconds:
+            return self._retry_after(depth)
+        if rate > 0 and depth / rate > self.config.max_backlog_seconds:
+            return self._retry_after(depth - rate * self.config.max_backlog_seconds)
+        if depth > self.config.shed_queue_depth:
+            shed_range = self.config.max_queue_depth - self.config.shed_queue_depth
+            share = (depth - self.config.shed_queue_depth) / shed_range
+            if random.random() < share:
+                return self._retry_after(depth - self.config.shed_queue_depth)
+        return None
+
+    async def check_rate_limit(self, client_id: str) -> int | None:
+        """Seconds until the client's bucket has a token again, None if a token was taken."""
+        if self._token_bucket is None:
+            return None
+        try:
+            allowed, wait = await self._token_bucket(keys=[f"ratelimit:client:{client_id}"],
+                                                     args=[self.config.client_rate, self.config.client_burst])
+        except Exception as e:
+            logger.warning(f"Rate limiter unavailable, admitting request: {e}")
+            return None
+        return None if int(allowed) else max(1, math.ceil(float(wait)))
+
+    async def admit(self, request: Request):
+        retry_after = self.check_backlog()
+        detail = "Transaction queue is overloaded, try again later."
+        if retry_after is None:
+            # the API token is shared by all callers, so the network address is the only identity
+            retry_after = await self.check_rate_limit(client_address(request, self.config.trusted_proxies))
+            detail = "Rate limit exceeded, try again later."
+        if retry_after is not None:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=detail,
+                headers={"Retry-After": str(retry_after)}
+            )
@@ -0,0 +1,92 @@
+import csv
+from typing import AsyncIterable, AsyncIterator
+
+import orjson
+from pydantic import ValidationError
+
+from app.config import settings
+from app.database.crud import CRUDUsers
+from app.schemas.user import BulkRegistrationReport, BulkRowIssue, UserData
+
+FORMATS = ("csv", "ndjson")
+
+
+async def iter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+    """Splits a stream of byte chunks into lines without buffering the whole body."""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.rstrip(b"\r")
+    if buffer:
+        yield buffer.rstrip(b"\r")
+
+
+def describe_error(e: Exception) -> str:
+    """One-line reason of a rejected row, naming the offending fields for validation errors."""
+    if isinstance(e, ValidationError):
+        return "; ".join(f"{'.'.join(str(part) for part in error['loc']) or 'row'}: {error['msg']}"
+                         for error in e.errors())
+    if isinstance(e, UnicodeDecodeError):
+        return f"invalid UTF-8 at byte {e.start}"
+    return str(e).splitlines()[0]
+
+
+async def iter_users(lines: AsyncIterable[bytes], fmt: str,
+                     report: BulkRegistrationReport) -> AsyncIterator[tuple[int, UserData]]:
+    """Parses CSV (with a username,password header) or NDJSON lines, bad rows go to report.invalid.
+
+    Lines are decoded one by one, so a line that is not valid UTF-8 is reported
+    instead of aborting an import whose earlier batches are already committed.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format {fmt}, expected one of {FORMATS}")
+    header = None
+    line_number = 0
+    async for raw in lines:
+        line_number += 1
+        try:
+            # Excel's "CSV UTF-8" starts the file with a BOM
+            line = raw.decode("utf-8-sig" if line_number == 1 else "utf-8")
+            if not line.strip():
+                continue
+            if fmt == "ndjson":
+                row = orjson.loads(line)
+            elif header is None:
+                header = next(csv.reader([line]))
+                continue
+            else:
+                row = dict(zip(header, next(csv.reader([line]))))
+            yield line_number, UserData.model_validate(row)
+        except (UnicodeDecodeError, orjson.JSONDecodeError, ValidationError, TypeError) as e:
+            report.invalid.append(BulkRowIssue(line=line_number, detail=describe_error(e)))
+
+
+async def register_users(crud: CRUDUsers, users: AsyncIterable[tuple[int, UserData]],
+                         report: BulkRegistrationReport,
+                         batch_size: int | None = None) -> BulkRegistrationReport:
+    """Inserts parsed users in batches, existing or repeated usernames are reported as conflicts."""
+    batch_size = batch_size or settings.db.bulk_batch_size
+    batch: dict[str, tuple[int, UserData]] = {}
+
+    async def flush():
+        created = await crud.create_users_bulk([(user.username, user.password) for _, user in batch.values()])
+        report.created += len(created)
+        for username, (line, _) in batch.items():
+            if username not in created:
+                report.conflicts.append(BulkRowIssue(line=line, username=username,
+                                                     detail="username already exists"))
+        batch.clear()
+
+    async for line, user in users:
+        if user.username in batch:
+            report.conflicts.append(BulkRowIssue(line=line, username=user.username,
+                                                 detail="duplicate username in input"))
+            continue
+        batch[user.username] = (line, user)
+        if len(batch) >= batch_size:
+            await flush()
+    if batch:
+        await flush()
+    return report
@@ -0,0 +1,171 @@
+import asyncio
+import time
+from functools import partial
+from typing import Awaitable, Callable
+
+import orjson
+import redis.asyncio as redis
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.config import settings
+from app.services.partitions import PartitionManager
+from app.services.rabbitmq import RabbitMQClient
+
+
+class HealthChecker:
+    """Pre-opens dependency connections at startup and reports per-dependency latency for probes.
+
+    The instance is not ready until warm_up() has finished, so load balancers only
+    route traffic to processes whose pools are already open. Read replicas are reported
+    but do not fail readiness, since reads fall back to the primary without them.
+    """
+
+    def __init__(self, engine: AsyncEngine | None = None,
+                 redis_client: redis.Redis | None = None,
+                 rabbitmq_client: RabbitMQClient | None = None,
+                 partitions: PartitionManager | None = None,
+                 replicas: list[AsyncEngine] | None = None,
+                 timeout: float | None = None):
+        self.engine = engine
+        self.replicas = replicas or []
+        self.redis_client = redis_client
+        self.rabbitmq_client = rabbitmq_client
+        self.timeout = timeout or settings.health.check_timeout
+        self.ready = False
+        self.last_report: dict = {"status": "starting", "checks": {}}
+        self.checks: dict[str, Callable[[], Awaitable]] = {}
+        self.optional: set[str] = set()
+        self._channel = None
+        if engine is not None:
+            self.checks["postgres"] = self.check_postgres
+        for replica in self.replicas:
+            name = f"replica:{replica.url.host}:{replica.url.port or 5432}"
+            self.checks[name] = partial(self.check_engine, replica)
+            self.optional.add(name)
+        if redis_client is not None:
+            self.checks["redis"] = self.check_redis
+        if rabbitmq_client is not None:
+            self.checks["rabbitmq"] = self.check_rabbitmq
+        if partitions is not None:
+            self.checks["partitions"] = partitions.check
+
+    async def warm_up(self, db_connections: int | None = None, redis_connections: int | None = None):
+        """Opens pool connections up front so the first requests do not pay for connection setup."""
+        db_connections = settings.health.warmup_db_connections if db_connections is None else db_connections
+        redis_connections = (settings.health.warmup_redis_connections if redis_connections is None
+                             else redis_connections)
+        started = time.perf_counter()
+        if self.engine is not None and db_connections:
+            await self._warm_up_engine(self.engine, db_connections)
+        if self.replicas and db_connections:
+            # an unreachable replica must not hold up startup, reads fall back to the primary
+            results = await asyncio.gather(
+                *(asyncio.wait_for(self._warm_up_engine(replica, db_connections), timeout=self.timeout)
+                  for replica in self.replicas),
+                return_exceptions=True,
+            )
+            for replica, result in zip(self.replicas, results):
+                if isinstance(result, BaseException):
+                    logger.warning(f"Could not warm up replica {replica.url.host}: {result!r}")
+        if self.redis_client is not None and redis_connections:
+            await asyncio.gather(*(self.redis_client.ping() for _ in range(redis_connections)))
+        if self.rabbitmq_client is not None:
+            if self.rabbitmq_client.channel is None:
+                await self.rabbitmq_client.connect()
+            # declared once here, probes afterwards only check it passively
+            await self.rabbitmq_client.channel.declare_queue(self.rabbitmq_client.queue_name, durable=True)
+        await self.check()
+        self.ready = True
+        logger.info(f"Warm-up finished in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    @staticmethod
+    async def _warm_up_engine(engine: AsyncEngine, count: int):
+        # connections above pool_size are closed on release, so warming them up is pointless
+        count = min(count, engine.pool.size())
+        connections = await asyncio.gather(*(engine.connect().start() for _ in range(count)))
+        await asyncio.gather(*(connection.close() for connection in connections))
+
+    @staticmethod
+    async def check_engine(engine: AsyncEngine):
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    async def check_postgres(self):
+        await self.check_engine(self.engine)
+
+    async def check_redis(self):
+        await self.redis_client.ping()
+
+    async def check_rabbitmq(self):
+        """Passive declare on a dedicated channel: a missing queue fails the probe instead of being
+        re-created, and the channel error it causes cannot close the publishing channel."""
+        if self.rabbitmq_client.channel is None or self.rabbitmq_client.channel.is_closed:
+            raise RuntimeError("RabbitMQ channel is not open")
+        if self._channel is None or self._channel.is_closed:
+            self._channel = await self.rabbitmq_client.connection.channel()
+        # robust=False: a robust channel keeps every declared queue for restore, one per probe
+        await self._channel.declare_queue(self.rabbitmq_client.queue_name, passive=True, robust=False)
+
+    async def close(self):
+        if self._channel is not None and not self._channel.is_closed:
+            await self._channel.close()
+
+    async def _timed(self, check: Callable[[], Awaitable]) -> dict:
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(check(), timeout=self.timeout)
+            result = {"status": "ok"}
+        except Exception as e:
+            result = {"status": "fail", "error": str(e) or type(e).__name__}
+        result["latency_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return result
+
+    async def check(self) -> dict:
+        """Runs every dependency check concurrently and stores the report."""
+        names = list(self.checks)
+        results = await asyncio.gather(*(self._timed(self.checks[name]) for name in names))
+        checks = dict(zip(names, results))
+        healthy = all(result["status"] == "ok" for name, result in checks.items() if name not in self.optional)
+        self.last_report = {"status": "ok" if healthy else "fail", "checks": checks}
+        return self.last_report
+
+    async def liveness(self) -> tuple[int, dict]:
+        """Always 200 while the process runs, with the latest dependency report attached."""
+        return 200, {"status": "alive", "ready": self.ready, "last_check": self.last_report}
+
+    async def readiness(self) -> tuple[int, dict]:
+        if not self.ready:
+            return 503, {"status": "warming up", "checks": {}}
+        report = await self.check()
+        return (200 if report["status"] == "ok" else 503), report
+
+
+async def serve_health(checker: HealthChecker, host: str, port: int) -> asyncio.Server:
+    """Minimal HTTP server exposing /healthz and /readyz for processes without an API."""
+    routes = {"/healthz": checker.liveness, "/readyz": checker.readiness}
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request_line.decode("latin-1").split()
+            handler = routes.get(parts[1].split("?")[0]) if len(parts) > 1 else None
+            status, body = await handler() if handler else (404, {"detail": "Not Found"})
+            payload = orjson.dumps(body)
+            reason = {200: "OK", 404: "Not Found", 503: "Service Unavailable"}[status]
+            writer.write(
+                f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode("latin-1") + payload
+            )
+            await writer.drain()
+        except Exception as e:
+            logger.error(f"Error serving health probe: {e}")
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    logger.info(f"Health endpoints listening on {host}:{port}")
+    return server
@@ -0,0 +1,38 @@
+import asyncio
+
+from loguru import logger
+
+from app.config import settings
+from app.database.crud import CRUDLedger
+from app.database.database import AsyncSessionManager
+from app.services.log import setup_logging
+
+
+class LedgerCompactor:
+    """Periodically folds new ledger entries into balance snapshots."""
+
+    def __init__(self, crud_ledger: CRUDLedger, interval: float | None = None):
+        self.crud_ledger = crud_ledger
+        self.interval = interval or settings.ledger.snapshot_interval
+
+    async def compact(self) -> int:
+        written = await self.crud_ledger.write_snapshots()
+        if written:
+            logger.info(f"Wrote {written} balance snapshots")
+        return written
+
+    async def run(self):
+        logger.info(f"Ledger compactor started, interval {self.interval}s")
+        while True:
+            try:
+                await self.compact()
+            except Exception as e:
+                logger.error(f"Error writing balance snapshots: {e}")
+            await asyncio.sleep(self.interval)
+
+
+if __name__ == "__main__":
+    setup_logging()
+    session_manager = AsyncSessionManager()
+    compactor = LedgerCompactor(CRUDLedger(session_manager.get_session()))
+    asyncio.run(compactor.run())
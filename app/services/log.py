@@ -0,0 +1,39 @@
+import random
+import sys
+
+from loguru import logger
+
+from app.config import LoggingConfig, settings
+
+FORMAT = (
+    "<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | <level>{level: <8}</level> | "
+    "{extra[correlation_id]} | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - "
+    "<level>{message}</level>"
+)
+
+_sample_rates: dict[str, float] = {}
+
+
+def setup_logging(config: LoggingConfig | None = None):
+    """Replaces the default loguru sink with the configured one.
+
+    With enqueue the sink is written from a background thread, so hot paths only pay
+    for building the record. Messages below LOG_LEVEL are dropped before formatting
+    when they are logged with loguru's "{}" arguments instead of f-strings.
+    """
+    config = config or settings.logging
+    logger.remove()
+    logger.configure(extra={"correlation_id": "-"})
+    logger.add(sys.stderr, level=config.level, format=FORMAT, serialize=config.json,
+               enqueue=config.enqueue, backtrace=False, diagnose=False)
+    _sample_rates.clear()
+    _sample_rates.update(config.sample_rates)
+
+
+def sampled(event: str) -> bool:
+    """Whether this occurrence of a high-volume event should be logged, per LOG_SAMPLE_RATES.
+
+    Events without a configured rate are always logged.
+    """
+    rate = _sample_rates.get(event, 1.0)
+    return rate >= 1.0 or (rate > 0 and random.random() < rate)
@@ -0,0 +1,149 @@
+import asyncio
+import re
+from datetime import datetime, timezone
+
+from loguru import logger
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from app.config import settings
+from app.database.database import AsyncSessionManager
+from app.services.log import setup_logging
+
+TABLE = "transactions"
+DEFAULT_PARTITION = f"{TABLE}_default"
+# two-int advisory key, serialises partition creation between workers and the maintenance process
+MAINTENANCE_LOCK = (0x50415254, 1)
+_UPPER_BOUND = re.compile(r"TO \('([^']+)'\)")
+
+
+def month_start(value: datetime, offset: int = 0) -> datetime:
+    """First instant (UTC) of the month `offset` months away from `value`."""
+    month = value.year * 12 + value.month - 1 + offset
+    return datetime(month // 12, month % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def partition_name(start: datetime) -> str:
+    return f"{TABLE}_p{start:%Y_%m}"
+
+
+class PartitionManager:
+    """Keeps monthly partitions of `transactions` created ahead of time and detaches expired ones.
+
+    Detached partitions are moved to the archive schema rather than dropped, so the
+    rows stay available for audits while the live table keeps its indexes small.
+    Transfers of a month without a partition land in the default partition instead of
+    failing, and are moved out once the month's partition is created.
+    """
+
+    def __init__(self, engine: AsyncEngine,
+                 months_ahead: int | None = None,
+                 retention_months: int | None = None,
+                 archive_schema: str | None = None,
+                 interval: float | None = None):
+        self.engine = engine
+        self.months_ahead = months_ahead or settings.partitions.months_ahead
+        self.retention_months = (settings.partitions.retention_months if retention_months is None
+                                 else retention_months)
+        self.archive_schema = archive_schema or settings.partitions.archive_schema
+        self.interval = interval or settings.partitions.maintenance_interval
+
+    @staticmethod
+    async def _list_partitions(conn: AsyncConnection) -> dict[str, datetime]:
+        result = await conn.execute(text(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+            "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = CAST(:table AS regclass)"
+        ), {"table": TABLE})
+        partitions = {}
+        for name, bound in result.all():
+            match = _UPPER_BOUND.search(bound or "")
+            if match:
+                partitions[name] = datetime.fromisoformat(match.group(1))
+        return partitions
+
+    async def list_partitions(self) -> dict[str, datetime]:
+        """Attached range partitions mapped to their exclusive upper bound."""
+        async with self.engine.connect() as conn:
+            return await self._list_partitions(conn)
+
+    async def ensure_partitions(self, now: datetime | None = None) -> list[str]:
+        """Creates the missing partitions of the current month and the next `months_ahead` months.
+
+        Rows the default partition holds for a new month are moved into it in the same
+        transaction, since Postgres refuses to create a partition those rows belong to.
+        """
+        now = now or datetime.now(timezone.utc)
+        created = []
+        async with self.engine.begin() as conn:
+            await conn.execute(select(func.pg_advisory_xact_lock(*MAINTENANCE_LOCK)))
+            existing = await self._list_partitions(conn)
+            for offset in range(self.months_ahead + 1):
+                start, end = month_start(now, offset), month_start(now, offset + 1)
+                name = partition_name(start)
+                if name in existing:
+                    continue
+                in_range = "created_at >= :start AND created_at < :end"
+                bounds = {"start": start, "end": end}
+                stranded = (await conn.execute(text(
+                    f'SELECT EXISTS (SELECT 1 FROM "{DEFAULT_PARTITION}" WHERE {in_range})'
+                ), bounds)).scalar_one()
+                if stranded:
+                    await conn.execute(text(f'ALTER TABLE {TABLE} DETACH PARTITION "{DEFAULT_PARTITION}"'))
+                await conn.execute(text(
+                    f'CREATE TABLE "{name}" PARTITION OF {TABLE} '
+                    f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+                ))
+                if stranded:
+                    await conn.execute(text(
+                        f'INSERT INTO "{name}" SELECT * FROM "{DEFAULT_PARTITION}" WHERE {in_range}'
+                    ), bounds)
+                    await conn.execute(text(f'DELETE FROM "{DEFAULT_PARTITION}" WHERE {in_range}'), bounds)
+                    await conn.execute(text(f'ALTER TABLE {TABLE} ATTACH PARTITION "{DEFAULT_PARTITION}" DEFAULT'))
+                    logger.warning(f"Moved rows of {name} out of the default partition")
+                created.append(name)
+        if created:
+            logger.info(f"Created partitions {', '.join(created)}")
+        return created
+
+    async def check(self, now: datetime | None = None):
+        """Readiness check: fails while the current or next month has no partition."""
+        now = now or datetime.now(timezone.utc)
+        existing = await self.list_partitions()
+        missing = [partition_name(month_start(now, offset)) for offset in (0, 1)
+                   if partition_name(month_start(now, offset)) not in existing]
+        if missing:
+            raise RuntimeError(f"Missing partitions {', '.join(missing)}, is partition maintenance running?")
+
+    async def archive_partitions(self, now: datetime | None = None) -> list[str]:
+        """Detaches partitions older than `retention_months` and moves them to the archive schema."""
+        if not self.retention_months:
+            return []
+        cutoff = month_start(now or datetime.now(timezone.utc), -self.retention_months)
+        expired = [name for name, upper in (await self.list_partitions()).items() if upper <= cutoff]
+        for name in expired:
+            async with self.engine.begin() as conn:
+                await conn.execute(text(f'ALTER TABLE {TABLE} DETACH PARTITION "{name}"'))
+                await conn.execute(text(f'CREATE SCHEMA IF NOT EXISTS "{self.archive_schema}"'))
+                await conn.execute(text(f'ALTER TABLE "{name}" SET SCHEMA "{self.archive_schema}"'))
+            logger.info(f"Partition {name} archived to schema {self.archive_schema}")
+        return expired
+
+    async def maintain(self):
+        await self.ensure_partitions()
+        await self.archive_partitions()
+
+    async def run(self):
+        logger.info(f"Partition maintenance started, interval {self.interval}s")
+        while True:
+            try:
+                await self.maintain()
+            except Exception as e:
+                logger.error(f"Error maintaining partitions: {e}")
+            await asyncio.sleep(self.interval)
+
+
+if __name__ == "__main__":
+    setup_logging()
+    manager = PartitionManager(AsyncSessionManager().engine)
+    asyncio.run(manager.run())
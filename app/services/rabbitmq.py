@@ -1,33 +1,106 @@
+import asyncio
+import time
+import uuid
+
 import aio_pika
+import orjson
+from aio_pika.abc import AbstractIncomingMessage
 from loguru import logger
 
 from app.config import settings
+from app.services.tracing import PUBLISHED_AT_HEADER, tracer
 
 
 class RabbitMQClient:
-    def __init__(self, amqp_url: str | None = settings.rabbitmq.url, 
-                 queue_name: str | None = settings.rabbitmq.queue_name):
+    def __init__(self, amqp_url: str | None = None, queue_name: str | None = None):
         self.amqp_url = amqp_url
         self.queue_name = queue_name
         self.connection = None
         self.channel = None
+        self.reply_queue = None
+        self._reply_lock = asyncio.Lock()
+        self._pending: dict[str, asyncio.Future] = {}
+        # messages successfully published to queue_name, read by the admission monitor
+        self.published = 0
 
     async def connect(self):
         """Establish connection and channel to RabbitMQ."""
+        self.amqp_url = self.amqp_url or settings.rabbitmq.url
+        self.queue_name = self.queue_name or settings.rabbitmq.queue_name
         self.connection = await aio_pika.connect_robust(self.amqp_url)
         self.channel = await self.connection.channel()
         logger.info(f"Connected to RabbitMQ at {self.amqp_url}")
 
-    async def send_message(self, message_body: str):
-        """Send message to the queue."""
+    async def send_message(self, message_body: str, correlation_id: str | None = None,
+                           reply_to: str | None = None, message_id: str | None = None):
+        """Send message to the queue, message_id doubles as the log correlation id."""
+        if not self.channel:
+            raise RuntimeError("RabbitMQ channel is not initialized. Call connect() first.")
+        with tracer.span("amqp.publish", queue=self.queue_name):
+            headers = tracer.inject({PUBLISHED_AT_HEADER: time.time_ns()}) if tracer.enabled else None
+            message = aio_pika.Message(body=message_body.encode(), correlation_id=correlation_id,
+                                       reply_to=reply_to, message_id=message_id or uuid.uuid4().hex,
+                                       headers=headers)
+            await self.channel.default_exchange.publish(
+                message,
+                routing_key=self.queue_name
+            )
+            self.published += 1
+        logger.debug("Message {} sent to queue {}", message.message_id, self.queue_name)
+
+    async def _ensure_reply_queue(self):
+        """Declares the exclusive reply queue and its single consumer on first use.
+
+        The name is ours rather than server-generated: the robust channel re-declares the
+        queue by name after a reconnect, and the broker refuses reserved amq.* names.
+        """
+        async with self._reply_lock:
+            if self.reply_queue is None:
+                queue = await self.channel.declare_queue(f"rpc.reply.{uuid.uuid4().hex}",
+                                                         exclusive=True, auto_delete=True)
+                await queue.consume(self._on_reply, no_ack=True)
+                self.reply_queue = queue
+
+    async def _on_reply(self, message: AbstractIncomingMessage):
+        future = self._pending.pop(message.correlation_id, None)
+        if future is None or future.done():
+            logger.debug(f"Dropping reply for unknown or expired call {message.correlation_id}")
+            return
+        future.set_result(orjson.loads(message.body))
+
+    async def call(self, message_body: str, timeout: float | None = None) -> dict:
+        """Send message with reply_to/correlation_id and wait for the worker's result.
+
+        Raises asyncio.TimeoutError if no result arrives in time, the message stays queued.
+        """
         if not self.channel:
             raise RuntimeError("RabbitMQ channel is not initialized. Call connect() first.")
-        message = aio_pika.Message(body=message_body.encode())
-        await self.channel.default_exchange.publish(
-            message,
-            routing_key=self.queue_name
-        )
-        logger.debug(f"Message sent to queue {self.queue_name}")
+        if self.reply_queue is None:
+            await self._ensure_reply_queue()
+        correlation_id = uuid.uuid4().hex
+        future = asyncio.get_running_loop().create_future()
+        self._pending[correlation_id] = future
+        try:
+            await self.send_message(message_body, correlation_id=correlation_id,
+                                    reply_to=self.reply_queue.name)
+            with tracer.span("amqp.await_reply"):
+                return await asyncio.wait_for(future, timeout or settings.rabbitmq.rpc_timeout)
+        finally:
+            self._pending.pop(correlation_id, None)
+
+    async def reply(self, request: AbstractIncomingMessage, result: dict):
+        """Publish a task result to the reply queue of the message that requested it.
+
+        Failures are only logged: the task is already done, so it must not be retried.
+        """
+        if not request.reply_to:
+            return
+        message = aio_pika.Message(body=orjson.dumps(result), correlation_id=request.correlation_id,
+                                   content_type="application/json")
+        try:
+            await self.channel.default_exchange.publish(message, routing_key=request.reply_to)
+        except Exception as e:
+            logger.error(f"Error sending reply {request.correlation_id}: {e}")
 
     async def close(self):
         """Close channel and connection."""
@@ -38,5 +111,5 @@ class RabbitMQClient:
         logger.info("RabbitMQ connection closed")
 
 
-rabbitmq = RabbitMQClient(amqp_url=settings.rabbitmq.url, 
-                         queue_name=settings.rabbitmq.queue_name)
+# url and queue are resolved from settings on connect()
+rabbitmq = RabbitMQClient()
@@ -0,0 +1,206 @@
+import argparse
+import asyncio
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+import orjson
+from loguru import logger
+from sqlalchemy import func, select, union_all
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from app.config import settings
+from app.database.crud import TRANSFER_BARRIER_LOCK
+from app.database.database import AsyncSessionManager
+from app.database.models import (BalanceSnapshot, LedgerEntry, ReconciliationBalance, ReconciliationState,
+                                 Transaction, User)
+from app.services.log import setup_logging
+
+STATE_ID = 1
+
+
+@dataclass
+class Drift:
+    user_id: int
+    expected: Decimal
+    actual: Decimal
+
+    @property
+    def amount(self) -> Decimal:
+        return self.actual - self.expected
+
+
+@dataclass
+class ReconciliationReport:
+    scanned_from: int = 0
+    scanned_to: int = 0
+    watermark: int = 0
+    users: int = 0
+    baselined: int = 0
+    drifts: list[Drift] = field(default_factory=list)
+
+
+def net_flows(low: int, high: int):
+    """Net amount per user over transactions with low < id <= high, aggregated by the database."""
+    window = (Transaction.id > low, Transaction.id <= high)
+    flows = union_all(
+        select(Transaction.sender_id.label("user_id"), (-Transaction.amount).label("delta")).where(*window),
+        select(Transaction.receiver_id.label("user_id"), Transaction.amount.label("delta")).where(*window),
+    ).subquery()
+    return select(flows.c.user_id, func.sum(flows.c.delta)).group_by(flows.c.user_id)
+
+
+def current_balances(ledger: bool):
+    """Balance of every user as the transfer path sees it, in one pass."""
+    if not ledger:
+        return select(User.id, User.balance)
+    snapshot = (
+        select(BalanceSnapshot.user_id, BalanceSnapshot.balance, BalanceSnapshot.last_entry_id)
+        .distinct(BalanceSnapshot.user_id)
+        .order_by(BalanceSnapshot.user_id, BalanceSnapshot.last_entry_id.desc())
+        .subquery()
+    )
+    entries = (
+        select(func.coalesce(func.sum(LedgerEntry.amount), 0))
+        .where(LedgerEntry.user_id == User.id,
+               LedgerEntry.id > func.coalesce(snapshot.c.last_entry_id, 0))
+        .scalar_subquery()
+    )
+    return (
+        select(User.id, func.coalesce(snapshot.c.balance, User.balance) + entries)
+        .outerjoin(snapshot, snapshot.c.user_id == User.id)
+    )
+
+
+class Reconciler:
+    """Recomputes every balance from the transaction history and reports users whose balance drifted.
+
+    Transactions are aggregated per user in id-range chunks by the database and only the
+    per-user sums are streamed back, so memory grows with the number of users, not the
+    history. Flows up to the watermark are kept in reconciliation_balances, which lets an
+    incremental run scan only the new transactions.
+
+    Users seen for the first time open at 0, so balances not explained by transfers are
+    reported. With `baseline` they open at whatever makes their books balance instead,
+    which is meant for the first run on a deployment with pre-existing balances; together
+    with `full` every stored opening balance is recomputed that way.
+    """
+
+    def __init__(self, engine: AsyncEngine,
+                 chunk_size: int | None = None,
+                 tolerance: Decimal | None = None,
+                 ledger: bool | None = None):
+        self.engine = engine
+        self.chunk_size = chunk_size or settings.reconciliation.chunk_size
+        self.tolerance = settings.reconciliation.tolerance if tolerance is None else tolerance
+        self.ledger = settings.ledger.enabled if ledger is None else ledger
+
+    async def _scan(self, conn: AsyncConnection, low: int, high: int, flows: dict[int, Decimal]):
+        for start in range(low, high, self.chunk_size):
+            end = min(start + self.chunk_size, high)
+            result = await conn.stream(net_flows(start, end))
+            async for user_id, delta in result:
+                flows[user_id] = flows.get(user_id, Decimal(0)) + delta
+            logger.debug("Reconciled transactions {}..{}", start + 1, end)
+
+    async def _settled_id(self) -> int:
+        """Highest transaction id at or below which every transfer has committed or rolled back."""
+        async with self.engine.begin() as conn:
+            await conn.execute(select(func.pg_advisory_xact_lock(*TRANSFER_BARRIER_LOCK)))
+            # READ COMMITTED: this statement's snapshot is taken after the lock was granted
+            return await conn.scalar(select(func.coalesce(func.max(Transaction.id), 0)))
+
+    async def reconcile(self, full: bool = False, baseline: bool = False) -> ReconciliationReport:
+        """Run one audit; `full` ignores the stored watermark and rescans the whole table.
+
+        Everything is read from a single REPEATABLE READ snapshot, so transfers committing
+        during the run cannot show up in balances but not in the scanned history.
+        Transactions above the settled id are counted but not persisted: ids are taken
+        before commit, so a lower id might still become visible after a higher one.
+        """
+        settled = await self._settled_id()
+        async with self.engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="REPEATABLE READ")
+            async with conn.begin():
+                watermark = 0 if full else (await conn.scalar(
+                    select(ReconciliationState.watermark).where(ReconciliationState.id == STATE_ID)
+                ) or 0)
+                head = await conn.scalar(select(func.max(Transaction.id))) or 0
+                # the snapshot is newer than the barrier, so it holds every id up to `settled`
+                settled = max(settled, watermark)
+
+                opening: dict[int, Decimal] = {}
+                stored: dict[int, Decimal] = {}
+                result = await conn.stream(select(ReconciliationBalance.user_id,
+                                                  ReconciliationBalance.opening_balance,
+                                                  ReconciliationBalance.net_flow))
+                async for user_id, opening_balance, net_flow in result:
+                    opening[user_id] = opening_balance
+                    stored[user_id] = Decimal(0) if full else net_flow
+
+                settled_flows: dict[int, Decimal] = {}
+                recent_flows: dict[int, Decimal] = {}
+                await self._scan(conn, watermark, settled, settled_flows)
+                await self._scan(conn, settled, head, recent_flows)
+
+                report = ReconciliationReport(scanned_from=watermark, scanned_to=head, watermark=settled)
+                updates = []
+                result = await conn.stream(current_balances(self.ledger))
+                async for user_id, actual in result:
+                    report.users += 1
+                    flow = stored.get(user_id, Decimal(0)) + settled_flows.get(user_id, Decimal(0))
+                    recent = recent_flows.get(user_id, Decimal(0))
+                    first_seen = user_id not in opening
+                    if baseline and (first_seen or full):
+                        opening[user_id] = actual - flow - recent
+                        report.baselined += 1
+                    elif first_seen:
+                        opening[user_id] = Decimal(0)
+                    expected = opening[user_id] + flow + recent
+                    if abs(actual - expected) > self.tolerance:
+                        report.drifts.append(Drift(user_id, expected, actual))
+                    if first_seen or full or user_id in settled_flows:
+                        updates.append({"user_id": user_id, "opening_balance": opening[user_id], "net_flow": flow})
+
+                await self._save(conn, updates, settled)
+        logger.info("Reconciled {} users over transactions {}..{}: {} drifted, {} baselined",
+                    report.users, report.scanned_from + 1, report.scanned_to,
+                    len(report.drifts), report.baselined)
+        return report
+
+    async def _save(self, conn: AsyncConnection, updates: list[dict], watermark: int):
+        batch_size = settings.db.bulk_batch_size
+        for start in range(0, len(updates), batch_size):
+            stmt = pg_insert(ReconciliationBalance).values(updates[start:start + batch_size])
+            await conn.execute(stmt.on_conflict_do_update(
+                index_elements=[ReconciliationBalance.user_id],
+                set_={"opening_balance": stmt.excluded.opening_balance, "net_flow": stmt.excluded.net_flow},
+            ))
+        stmt = pg_insert(ReconciliationState).values(id=STATE_ID, watermark=watermark)
+        await conn.execute(stmt.on_conflict_do_update(
+            index_elements=[ReconciliationState.id],
+            set_={"watermark": stmt.excluded.watermark, "updated_at": func.now()},
+        ))
+
+
+async def main(full: bool, baseline: bool, chunk_size: int | None) -> int:
+    """Print drifted users as JSON lines; the exit status is 1 when any drifted."""
+    engine = AsyncSessionManager().engine
+    report = await Reconciler(engine, chunk_size=chunk_size).reconcile(full=full, baseline=baseline)
+    await engine.dispose()
+    for drift in report.drifts:
+        print(orjson.dumps({"user_id": drift.user_id, "expected": str(drift.expected),
+                            "actual": str(drift.actual), "drift": str(drift.amount)}).decode("utf-8"))
+    return 1 if report.drifts else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Balance reconciliation against the transaction history")
+    parser.add_argument("--full", action="store_true", help="ignore the watermark and rescan every transaction")
+    parser.add_argument("--baseline", action="store_true",
+                        help="accept the current balance of users seen for the first time instead of 0, "
+                             "with --full of every user")
+    parser.add_argument("--chunk-size", type=int, help="transaction ids per query, defaults to RECONCILIATION_CHUNK_SIZE")
+    args = parser.parse_args()
+    setup_logging()
+    raise SystemExit(asyncio.run(main(args.full, args.baseline, args.chunk_size)))
@@ -0,0 +1,197 @@
+import asyncio
+import os
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator
+
+import aiohttp
+import orjson
+from loguru import logger
+
+from app.config import TracingConfig, settings
+
+TRACEPARENT_HEADER = "traceparent"
+PUBLISHED_AT_HEADER = "x-published-at-ns"
+
+
+@dataclass
+class SpanContext:
+    trace_id: str
+    span_id: str
+    sampled: bool = True
+
+
+@dataclass
+class Span:
+    name: str
+    context: SpanContext
+    parent_id: str | None = None
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: int | None = None
+    attributes: dict = field(default_factory=dict)
+    error: str | None = None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.context.trace_id,
+            "spanId": self.context.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(key, value) for key, value in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+def _otlp_attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+_current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+
+class Tracer:
+    """Minimal tracer: W3C traceparent propagation and batched export of finished spans.
+
+    Spans are only buffered on the hot path; a background task exports them every
+    export_interval seconds to a JSON lines file or an OTLP/HTTP collector.
+    When disabled, span() costs a context variable lookup and nothing is recorded.
+    """
+
+    def __init__(self):
+        self.config: TracingConfig | None = None
+        self.service_name = "app"
+        self.enabled = False
+        self._buffer: list[Span] = []
+        self._export_task: asyncio.Task | None = None
+        self._http: aiohttp.ClientSession | None = None
+
+    def setup(self, service_name: str, config: TracingConfig | None = None):
+        """Enables tracing per settings and starts the exporter, needs a running event loop."""
+        self.config = config or settings.tracing
+        self.service_name = service_name
+        self.enabled = self.config.enabled
+        if self.enabled and self._export_task is None:
+            self._export_task = asyncio.create_task(self._export_loop())
+            logger.info(f"Tracing enabled, exporting to {self.config.exporter}")
+
+    @contextmanager
+    def span(self, name: str, parent: SpanContext | None = None, **attributes) -> Iterator[Span | None]:
+        """Records the enclosed block as a child of `parent` or of the current span."""
+        if not self.enabled:
+            yield None
+            return
+        current = _current_span.get()
+        parent = parent or (current.context if current else None)
+        if parent is None:
+            context = SpanContext(os.urandom(16).hex(), os.urandom(8).hex(),
+                                  sampled=random.random() < self.config.sample_rate)
+        else:
+            context = SpanContext(parent.trace_id, os.urandom(8).hex(), sampled=parent.sampled)
+        span = Span(name, context, parent.span_id if parent else None, attributes=attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span.error = str(e) or type(e).__name__
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end_ns = time.time_ns()
+            self._finish(span)
+
+    def record(self, name: str, start_ns: int, end_ns: int, parent: SpanContext | None = None, **attributes):
+        """Records an interval measured elsewhere, e.g. the time a message waited in the queue."""
+        if not self.enabled or parent is None:
+            return
+        span = Span(name, SpanContext(parent.trace_id, os.urandom(8).hex(), parent.sampled),
+                    parent.span_id, start_ns, end_ns, attributes)
+        self._finish(span)
+
+    def _finish(self, span: Span):
+        if span.context.sampled and len(self._buffer) < self.config.max_queue:
+            self._buffer.append(span)
+
+    def inject(self, headers: dict) -> dict:
+        """Adds the current trace context to outgoing AMQP message headers."""
+        current = _current_span.get()
+        if current is not None:
+            flags = "01" if current.context.sampled else "00"
+            headers[TRACEPARENT_HEADER] = f"00-{current.context.trace_id}-{current.context.span_id}-{flags}"
+        return headers
+
+    @staticmethod
+    def extract(headers: dict | None) -> SpanContext | None:
+        """Reads the trace context of an incoming AMQP message."""
+        value = (headers or {}).get(TRACEPARENT_HEADER)
+        if isinstance(value, bytes):
+            value = value.decode()
+        parts = value.split("-") if value else []
+        if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+            return None
+        return SpanContext(parts[1], parts[2], sampled=parts[3] == "01")
+
+    async def _export_loop(self):
+        while True:
+            await asyncio.sleep(self.config.export_interval)
+            await self.flush()
+
+    async def flush(self):
+        if not self._buffer:
+            return
+        spans, self._buffer = self._buffer, []
+        try:
+            if self.config.exporter == "otlp":
+                await self._export_otlp(spans)
+            else:
+                await asyncio.to_thread(self._export_file, spans)
+        except Exception as e:
+            logger.error(f"Error exporting {len(spans)} spans: {e}")
+
+    def _payload(self, spans: list[Span]) -> dict:
+        return {"resourceSpans": [{
+            "resource": {"attributes": [_otlp_attribute("service.name", self.service_name)]},
+            "scopeSpans": [{"scope": {"name": "app.services.tracing"},
+                            "spans": [span.to_otlp() for span in spans]}],
+        }]}
+
+    def _export_file(self, spans: list[Span]):
+        with open(self.config.file, "ab") as file:
+            file.write(orjson.dumps(self._payload(spans)) + b"\n")
+
+    async def _export_otlp(self, spans: list[Span]):
+        if self._http is None:
+            self._http = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5))
+        async with self._http.post(self.config.otlp_endpoint, data=orjson.dumps(self._payload(spans)),
+                                   headers={"Content-Type": "application/json"}) as response:
+            if response.status >= 400:
+                logger.error(f"Collector rejected spans: {response.status} {await response.text()}")
+
+    async def shutdown(self):
+        if self._export_task is not None:
+            self._export_task.cancel()
+            self._export_task = None
+        if self.enabled:
+            await self.flush()
+        if self._http is not None:
+            await self._http.close()
+            self._http = None
+
+
+tracer = Tracer()
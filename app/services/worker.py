@@ -1,20 +1,27 @@
 import asyncio
 import json
+import time
+from contextlib import nullcontext
 
 from loguru import logger
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
 import aio_pika
 
 from app.config import settings
 
 from app.database.database import AsyncSessionManager, InitDB
-from app.database.crud import CRUDUsers, CRUDTransactions
+from app.database.crud import CRUDLedger, CRUDOptimisticTransactions, CRUDUsers, CRUDTransactions
 
 from app.schemas.user import UserData
 from app.schemas.transaction import TransactionCreate
 
+from app.services.health import HealthChecker, serve_health
+from app.services.log import sampled, setup_logging
+from app.services.partitions import PartitionManager
 from app.services.rabbitmq import RabbitMQClient
-from app.services.redis_lock import acquire_locks, is_locked
+from app.services.redis_lock import acquire_locks, get_redis_client, is_locked
+from app.services.tracing import PUBLISHED_AT_HEADER, tracer
 
 
 class TaskRouter:
@@ -73,8 +80,17 @@ class TaskRouter:
             return {"status": "error", "detail": "sender and receiver cannot be the same"}
         try:
             await self.crud_transactions.create_transaction(transaction)
-            logger.info(f"Transaction created: {transaction.sender_id} -> {transaction.receiver_id}, Amount: {transaction.amount}")
+            if sampled("transaction_created"):
+                logger.info("Transaction created: {} -> {}, Amount: {}",
+                            transaction.sender_id, transaction.receiver_id, transaction.amount)
             return {"status": "success"}
+        except ValueError as e:
+            if sampled("transaction_rejected"):
+                logger.warning("Transaction rejected: {}", e)
+            return {"status": "error", "detail": str(e)}
+        except StaleDataError:
+            logger.warning("Transaction failed: users kept changing concurrently, retries exhausted")
+            return {"status": "error", "detail": "concurrent update, try again"}
         except IntegrityError:
             logger.error(f"Transaction failed: insufficient funds or invalid user IDs")
             return {"status": "error", "detail": "insufficient funds or invalid user IDs"}
@@ -90,16 +106,35 @@ def extract_user_ids(task_data: dict) -> list[int]:
     return []
 
 class Worker:
-    def __init__(self, task_router: TaskRouter, rabbitmq_client: RabbitMQClient):
+    def __init__(self, task_router: TaskRouter, rabbitmq_client: RabbitMQClient,
+                 health: HealthChecker | None = None, redis_locks: bool | None = None,
+                 partitions: PartitionManager | None = None):
         self.task_router = task_router
         self.rabbitmq_client = rabbitmq_client
+        self.health = health
+        self.partitions = partitions
+        self.redis_locks = settings.transfer.redis_locks if redis_locks is None else redis_locks
+        self.health_server = None
         self.queue = None 
 
     async def run(self):
-        InitDB()
+        tracer.setup("worker")
+        if self.health and settings.health.worker_port:
+            self.health_server = await serve_health(self.health, settings.health.worker_host,
+                                                    settings.health.worker_port)
+        if settings.db.bootstrap:
+            await InitDB().custom_create_database()
+        if self.partitions:
+            # transfers of the coming months must not depend on the maintenance process alone
+            try:
+                await self.partitions.ensure_partitions()
+            except Exception as e:
+                logger.error(f"Error creating partitions at startup: {e}")
 
         await self.rabbitmq_client.connect()
         self.queue = await self.rabbitmq_client.channel.declare_queue(self.rabbitmq_client.queue_name, durable=True)
+        if self.health:
+            await self.health.warm_up()
 
         logger.info("Worker started. Polling messages...")
 
@@ -109,45 +144,74 @@ class Worker:
             except aio_pika.exceptions.QueueEmpty:
                 await asyncio.sleep(1)
                 continue
+            with logger.contextualize(correlation_id=message.correlation_id or message.message_id or "-"):
+                await self.handle_message(message)
+
+    async def handle_message(self, message: aio_pika.abc.AbstractIncomingMessage):
+        parent = tracer.extract(message.headers)
+        published_at = (message.headers or {}).get(PUBLISHED_AT_HEADER)
+        if published_at:
+            tracer.record("amqp.queue_wait", int(published_at), time.time_ns(), parent)
+        with tracer.span("worker.handle_message", parent=parent):
             try:
                 task_data = json.loads(message.body.decode())
-                logger.info(f"Received task: {task_data}")
+                if sampled("task_received"):
+                    logger.info("Received task: {}", task_data)
 
                 user_ids = extract_user_ids(task_data)
                 if task_data.get("task") == "create_transaction":
                     data = task_data.get("data", {})
                     if data.get("sender_id") == data.get("receiver_id"):
-                        logger.info(f"Sender and receiver are the same ({data.get('sender_id')}), skipping task.")
+                        logger.info("Sender and receiver are the same ({}), skipping task.", data.get('sender_id'))
                         await message.ack()
-                        continue
-                if user_ids:
+                        await self.rabbitmq_client.reply(
+                            message, {"status": "error", "detail": "sender and receiver cannot be the same"}
+                        )
+                        return
+                if user_ids and self.redis_locks:
                     locked = await is_locked(user_ids)
                     if locked:
-                        logger.debug(f"Users {user_ids} locked. Requeuing message.")
+                        logger.debug("Users {} locked. Requeuing message.", user_ids)
                         await message.nack(requeue=True)
                         await asyncio.sleep(0.5)
-                        continue
+                        return
 
-                async with acquire_locks(user_ids):
-                    result = await self.task_router.route(task_data)
+                async with acquire_locks(user_ids) if self.redis_locks else nullcontext():
+                    with tracer.span("task.route", task=task_data.get("task")):
+                        result = await self.task_router.route(task_data)
 
-                logger.info(f"Task result: {result}")
+                if sampled("task_result"):
+                    logger.info("Task result: {}", result)
                 await message.ack()
+                await self.rabbitmq_client.reply(message, result)
 
             except Exception as e:
                 logger.error(f"Error handling message: {e}")
                 if message:
                     await message.ack()
-                    await self.rabbitmq_client.send_message(message.body.decode())
+                    await self.rabbitmq_client.send_message(message.body.decode(),
+                                                            correlation_id=message.correlation_id,
+                                                            reply_to=message.reply_to,
+                                                            message_id=message.message_id)
                 await asyncio.sleep(0.5)
 
 
 if __name__ == "__main__":
+    setup_logging()
     session_manager = AsyncSessionManager()
     session = session_manager.get_session() 
     crud_users = CRUDUsers(session=session)
-    crud_transactions = CRUDTransactions(session=session)
+    if settings.ledger.enabled:
+        crud_transactions = CRUDLedger(session=session)
+    elif settings.transfer.concurrency_mode == "optimistic":
+        crud_transactions = CRUDOptimisticTransactions(session=session)
+    else:
+        crud_transactions = CRUDTransactions(session=session)
     rabbitmq = RabbitMQClient(amqp_url=settings.rabbitmq.url, queue_name=settings.rabbitmq.queue_name)
     router = TaskRouter(crud_users, crud_transactions)
-    worker = Worker(router, rabbitmq)
+    partitions = PartitionManager(session_manager.engine)
+    health = HealthChecker(engine=session_manager.engine, rabbitmq_client=rabbitmq,
+                           redis_client=get_redis_client() if settings.transfer.redis_locks else None,
+                           partitions=partitions)
+    worker = Worker(router, rabbitmq, health, partitions=partitions)
     asyncio.run(worker.run())
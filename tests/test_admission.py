@@ -0,0 +1,155 @@
+import time
+from ipaddress import ip_network
+from types import SimpleNamespace
+
+import pytest
+from starlette.requests import Request
+
+from app.config import AdmissionConfig
+from app.services.admission import AdmissionController, QueueMonitor, client_address
+
+
+def make_config(**overrides) -> AdmissionConfig:
+    values = dict(enabled=True, sample_interval=1, shed_queue_depth=100, max_queue_depth=1000,
+                  max_backlog_seconds=10, max_retry_after=60, client_rate=0, client_burst=2,
+                  trusted_proxies=[])
+    values.update(overrides)
+    return AdmissionConfig(**values)
+
+
+def make_monitor(depth: int | None, drain_rate: float) -> QueueMonitor:
+    monitor = QueueMonitor(rabbitmq_client=None, interval=1)
+    monitor.depth, monitor.drain_rate = depth, drain_rate
+    monitor.sampled_at = monitor.drained_at = time.monotonic()
+    return monitor
+
+
+class FakeQueue:
+    def __init__(self, depth: int):
+        self.declaration_result = SimpleNamespace(message_count=depth)
+
+
+class FakeChannel:
+    is_closed = False
+
+    def __init__(self, depths: list[int]):
+        self.depths = depths
+        self.declared = []
+
+    async def declare_queue(self, name, **kwargs):
+        self.declared.append(kwargs)
+        return FakeQueue(self.depths.pop(0))
+
+
+class FakeConnection:
+    def __init__(self, channel: FakeChannel):
+        self._channel = channel
+
+    async def channel(self):
+        return self._channel
+
+
+def make_request(peer: str, forwarded: str | None = None) -> Request:
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return Request({"type": "http", "headers": headers, "client": (peer, 40000)})
+
+
+def test_retry_after_is_excess_over_drain_rate():
+    controller = AdmissionController(make_monitor(0, 100), config=make_config())
+    assert controller._retry_after(250) == 3
+    assert controller._retry_after(1) == 1
+    assert controller._retry_after(10 ** 6) == 60
+
+
+def test_retry_after_without_drain_rate_is_the_maximum():
+    controller = AdmissionController(make_monitor(0, 0), config=make_config())
+    assert controller._retry_after(5) == 60
+
+
+def test_backlog_admits_on_stale_sample():
+    monitor = make_monitor(5000, 1)
+    monitor.sampled_at -= 10
+    assert AdmissionController(monitor, config=make_config()).check_backlog() is None
+
+
+def test_backlog_admits_below_shed_depth():
+    assert AdmissionController(make_monitor(50, 100), config=make_config()).check_backlog() is None
+
+
+def test_backlog_rejects_past_max_depth():
+    controller = AdmissionController(make_monitor(1000, 100), config=make_config())
+    assert controller.check_backlog() == 9
+
+
+def test_backlog_rejects_past_max_backlog_seconds():
+    # 500 messages at 20/s is 25 s of backlog, 300 above the 10 s limit
+    controller = AdmissionController(make_monitor(500, 20), config=make_config())
+    assert controller.check_backlog() == 15
+
+
+def test_backlog_sheds_proportionally(monkeypatch):
+    controller = AdmissionController(make_monitor(550, 1000), config=make_config())
+    monkeypatch.setattr("app.services.admission.random.random", lambda: 0.49)
+    assert controller.check_backlog() == 1
+    monkeypatch.setattr("app.services.admission.random.random", lambda: 0.51)
+    assert controller.check_backlog() is None
+
+
+def test_backlog_rejects_stalled_queue_despite_decaying_rate():
+    monitor = make_monitor(50, 100)
+    monitor.drained_at -= 11
+    controller = AdmissionController(monitor, config=make_config())
+    assert controller.check_backlog() == 1
+    monitor.depth = 0
+    assert controller.check_backlog() is None
+
+
+@pytest.mark.asyncio
+async def test_monitor_counts_own_publishes_and_tracks_drain():
+    channel = FakeChannel([10, 12, 12, 5])
+    client = SimpleNamespace(connection=FakeConnection(channel), queue_name="tasks", published=0)
+    monitor = QueueMonitor(client, interval=1)
+    await monitor.sample()
+    first_drain = monitor.drained_at
+    client.published = 5
+    await monitor.sample()
+    assert monitor.drain_rate > 0
+    assert monitor.drained_at > first_drain
+    stalled_since = monitor.drained_at
+    await monitor.sample()
+    assert monitor.drained_at == stalled_since
+    assert monitor.stalled_for() > 0
+    await monitor.sample()
+    assert monitor.drained_at == monitor.sampled_at
+    assert all(kwargs == {"passive": True, "robust": False} for kwargs in channel.declared)
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_allows_burst_then_waits():
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    controller = AdmissionController(make_monitor(0, 0), fakeredis.FakeAsyncRedis(),
+                                     config=make_config(client_rate=0.5, client_burst=2))
+    assert await controller.check_rate_limit("10.0.0.1") is None
+    assert await controller.check_rate_limit("10.0.0.1") is None
+    assert await controller.check_rate_limit("10.0.0.1") == 2
+    assert await controller.check_rate_limit("10.0.0.2") is None
+
+
+def test_client_address_ignores_forwarded_for_without_trusted_proxies():
+    assert client_address(make_request("203.0.113.7", "198.51.100.1"), []) == "203.0.113.7"
+
+
+def test_client_address_ignores_forwarded_for_from_untrusted_peer():
+    trusted = [ip_network("10.0.0.0/8")]
+    assert client_address(make_request("203.0.113.7", "198.51.100.1"), trusted) == "203.0.113.7"
+
+
+def test_client_address_takes_first_untrusted_hop_from_the_right():
+    trusted = [ip_network("10.0.0.0/8")]
+    request = make_request("10.0.0.2", "198.51.100.1, 203.0.113.7, 10.0.0.1")
+    assert client_address(request, trusted) == "203.0.113.7"
+
+
+def test_client_address_falls_back_to_peer_without_forwarded_for():
+    assert client_address(make_request("10.0.0.2"), [ip_network("10.0.0.0/8")]) == "10.0.0.2"
@@ -0,0 +1,62 @@
+import pytest
+
+from app.schemas.user import BulkRegistrationReport
+from app.services.bulk_import import iter_lines, iter_users
+
+
+async def chunked(*chunks: bytes):
+    for chunk in chunks:
+        yield chunk
+
+
+async def parse(fmt: str, *chunks: bytes) -> tuple[list[tuple[int, str]], BulkRegistrationReport]:
+    report = BulkRegistrationReport()
+    users = [(line, user.username) async for line, user in iter_users(iter_lines(chunked(*chunks)), fmt, report)]
+    return users, report
+
+
+@pytest.mark.asyncio
+async def test_lines_split_across_chunk_boundaries():
+    lines = [line async for line in iter_lines(chunked(b"ali", b"ce\r\nb", b"ob\n", b"carol"))]
+    assert lines == [b"alice", b"bob", b"carol"]
+
+
+@pytest.mark.asyncio
+async def test_csv_with_byte_order_mark():
+    users, report = await parse("csv", "\ufeffusername,password\r\nalice,secret\r\n".encode("utf-8"))
+    assert users == [(2, "alice")]
+    assert report.invalid == []
+
+
+@pytest.mark.asyncio
+async def test_csv_quoted_comma():
+    users, report = await parse("csv", b'username,password\nalice,"se,cret"\n')
+    assert users == [(2, "alice")]
+    assert report.invalid == []
+
+
+@pytest.mark.asyncio
+async def test_invalid_utf8_is_reported_per_line():
+    users, report = await parse("csv", b"username,password\nb\xffb,secret\nalice,secret\n")
+    assert users == [(3, "alice")]
+    assert [(issue.line, issue.detail) for issue in report.invalid] == [(2, "invalid UTF-8 at byte 1")]
+
+
+@pytest.mark.asyncio
+async def test_missing_field_names_the_field():
+    users, report = await parse("csv", b"username,password\nalice\n")
+    assert users == []
+    assert [(issue.line, issue.detail) for issue in report.invalid] == [(2, "password: Field required")]
+
+
+@pytest.mark.asyncio
+async def test_ndjson_rejects_rows_that_are_not_objects():
+    users, report = await parse("ndjson", b'[1, 2]\n"alice"\n{not json}\n{"username": "bob", "password": "secret"}\n')
+    assert users == [(4, "bob")]
+    assert [issue.line for issue in report.invalid] == [1, 2, 3]
+
+
+@pytest.mark.asyncio
+async def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError):
+        await parse("xml", b"<users/>")
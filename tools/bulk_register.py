@@ -0,0 +1,45 @@
+import argparse
+import asyncio
+from pathlib import Path
+
+import orjson
+from loguru import logger
+
+from app.database.crud import CRUDUsers
+from app.database.database import AsyncSessionManager
+from app.schemas.user import BulkRegistrationReport
+from app.services.bulk_import import FORMATS, iter_users, register_users
+
+
+async def read_lines(path: Path):
+    with path.open("rb") as file:
+        for line in file:
+            yield line.rstrip(b"\r\n")
+
+
+async def main(path: Path, fmt: str, batch_size: int | None):
+    """
+    Load users from a CSV or NDJSON file straight into the database
+    and print the report with per-row conflicts as JSON.
+    """
+    session_manager = AsyncSessionManager()
+    crud = CRUDUsers(session_manager.get_session())
+    report = BulkRegistrationReport()
+    users = iter_users(read_lines(path), fmt, report)
+    await register_users(crud, users, report, batch_size=batch_size)
+    await session_manager.engine.dispose()
+    logger.info(f"Created {report.created} users, {len(report.conflicts)} conflicts, "
+                f"{len(report.invalid)} invalid rows")
+    print(orjson.dumps(report.model_dump(), option=orjson.OPT_INDENT_2).decode("utf-8"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk user registration")
+    parser.add_argument("path", type=Path, help="CSV (username,password header) or NDJSON file")
+    parser.add_argument("--format", choices=FORMATS, help="defaults to the file extension")
+    parser.add_argument("--batch-size", type=int, help="rows per INSERT, defaults to DB_BULK_BATCH_SIZE")
+    args = parser.parse_args()
+    fmt = args.format or args.path.suffix.lstrip(".").lower()
+    if fmt not in FORMATS:
+        parser.error(f"cannot infer format from {args.path.name}, pass --format")
+    asyncio.run(main(args.path, fmt, args.batch_size))